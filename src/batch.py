@@ -0,0 +1,85 @@
+#! /usr/bin/env python
+__author__ = 'Joris Quenee'
+
+# Play thousands of headless games to tune the difficulty.
+#
+# Every game is played by a bot walking the route to the exit, tick by tick
+# as main.main would do, on a pool of processes. The summary tells how
+# often the wolf wins for the given actor timers:
+#
+#   ./src/batch.py --games 10000 --wolf 300 --mouse 300
+
+import argparse
+import multiprocessing
+import time
+import engine
+from generators import NAMES
+from gconstants import *
+
+def bot_move(game, route):
+    """Direction held by the bot: next move on its route to the exit."""
+    player, exit = game.player, game.exit
+    if player.x == exit.x and player.y == exit.y:
+        return 'E'
+    # the route is only read again when the player moved
+    if route[0] != player.steps:
+        route[:] = [player.steps, game.routes.path(player, exit)[-1]]
+    return route[1]
+
+def play(job):
+    """Play one game and return (outcome, duration in ms, mice eaten)."""
+    seed, periods, limit, wolves, hunting, seeking, generator = job
+    game = engine.Game(WIDTH, HIGH, 0, None, seed, periods)
+    game.hunting = hunting
+    game.seeking = seeking
+    game.generator = generator
+    game.generate(MICE, CHEESES, wolves)
+    route = [None, None] # player steps when the route was read, next move
+    while not game.end_game and game.time < limit:
+        game.tick([bot_move(game, route)])
+    eaten = len([mouse for mouse in game.mice if not mouse.alive])
+    return game.outcome or 'timeout', game.time, eaten
+
+def run(games, periods, seed=0, limit=300000, processes=None, wolves=WOLVES, hunting=HUNTING,
+        generator=GENERATOR, seeking=SEEKING):
+    """Play games on a process pool and return their results."""
+    jobs = [(seed + i, periods, limit, wolves, hunting, seeking, generator) for i in range(games)]
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(play, jobs, chunksize=max(1, games // (8 * multiprocessing.cpu_count())))
+    finally:
+        pool.close()
+        pool.join()
+
+def main():
+    parser = argparse.ArgumentParser(description='Play headless games of Trap.')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None, help='default: one per CPU')
+    parser.add_argument('--limit', type=int, default=300000, help='give up a game after this time (ms)')
+    parser.add_argument('--player', type=int, default=PLAYER_TIMER, help='player timer (ms)')
+    parser.add_argument('--wolf', type=int, default=WOLF_TIMER, help='wolf timer (ms)')
+    parser.add_argument('--mouse', type=int, default=MOUSE_TIMER, help='mouse timer (ms)')
+    parser.add_argument('--teleportation', type=int, default=TELEPORTATION_TIMER, help='teleportation timer (ms)')
+    parser.add_argument('--wolves', type=int, default=WOLVES)
+    parser.add_argument('--hunting', action='store_true', default=HUNTING, help='the wolves chase the player')
+    parser.add_argument('--seeking', action='store_true', default=SEEKING, help='the mice head for the cheeses')
+    parser.add_argument('--generator', choices=NAMES, default=GENERATOR, help='maze generator')
+    args = parser.parse_args()
+
+    periods = {'player': args.player, 'wolf': args.wolf,
+               'mouse': args.mouse, 'teleportation': args.teleportation}
+    start = time.time()
+    results = run(args.games, periods, args.seed, args.limit, args.processes, args.wolves, args.hunting,
+                  args.generator, args.seeking)
+    elapsed = time.time() - start
+
+    for outcome in ('exit', 'killed', 'timeout'):
+        durations = [duration for o, duration, eaten in results if o == outcome]
+        mean = sum(durations) / len(durations) / 1000.0 if durations else 0
+        print("{:8} {:6.1%}  mean {:6.1f} s".format(outcome, len(durations) / float(len(results)), mean))
+    print("mice eaten {:.2f} by game".format(sum(eaten for o, d, eaten in results) / float(len(results))))
+    print("{} games in {:.1f} s ({:.0f} games/s)".format(len(results), elapsed, len(results) / elapsed))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+#! /usr/bin/env python
+__author__ = 'Joris Quenee'
+
+# Benchmarks of the maze generation, the path finding, the game ticks and the
+# frame rendering.
+#
+# The display and the mixer are the SDL dummy drivers, so the suite runs
+# anywhere, from the game directory as main.py. The results are JSON: keep
+# the file of a commit and compare the next commit with it:
+#
+#   ./src/bench.py --output before.json
+#   ./src/bench.py --compare before.json
+#
+# Every case is timed repeat times (min and mean), then run once more under
+# tracemalloc for its memory peak and the blocks it left allocated.
+
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import gc
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+try:
+    import tracemalloc
+except ImportError: # Python 2.x
+    tracemalloc = None
+import pygame
+import engine
+from generators import NAMES, GENERATORS
+from scheduler import Rng
+from endless import ChunkedGrid
+from routing import Visibility, cells as visible_cells
+import savegame
+from maze import Maze
+from gconstants import *
+
+clock = getattr(time, 'perf_counter', time.time)
+
+SIZES = [(16, 12), (64, 48), (256, 192)]
+
+def measure(name, params, setup, run, repeat):
+    """Time run(setup()) and return its result.
+
+    run returns the number of operations it made, the time by operation is
+    reported as op_us.
+
+    """
+    times = []
+    for i in range(repeat):
+        state = setup()
+        gc.collect()
+        start = clock()
+        ops = run(state)
+        times.append(clock() - start)
+    result = {'name': name, 'params': params, 'ops': ops,
+              'min_ms': round(min(times) * 1000, 3),
+              'mean_ms': round(sum(times) / len(times) * 1000, 3),
+              'op_us': round(min(times) * 1e6 / max(ops, 1), 3)}
+    if tracemalloc:
+        state = setup()
+        gc.collect()
+        tracemalloc.start()
+        run(state)
+        current, peak = tracemalloc.get_traced_memory()
+        # blocks allocated by the run and still alive at its end
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+        tracemalloc.stop()
+        result['peak_kb'] = round(peak / 1024.0, 1)
+        result['blocks'] = blocks
+    sys.stderr.write("{:10} {:40} {:10.3f} ms\n".format(name, json.dumps(params, sort_keys=True), result['min_ms']))
+    return result
+
+def generation(screen, size, repeat):
+    """Build a whole maze with its background, as a new level does."""
+    def run(state):
+        maze = Maze(screen.get_size(), 0, None, None, 0, size)
+        maze.make_maze(screen)
+        return 1
+    return measure('generation', {'size': size}, lambda: None, run, repeat)
+
+def resume(screen, size, repeat):
+    """Load a saved level into a maze ready to show, as a resumed game or a
+    fixture does."""
+    game = engine.Game(size[0], size[1], 0, None, 0)
+    game.generate()
+    data = savegame.save(game)
+    def run(state):
+        Maze(screen.get_size(), 0, None, None, game=savegame.load(data)).resume()
+        return 1
+    return measure('resume', {'size': size, 'bytes': len(data)}, lambda: None, run, repeat)
+
+def carving(name, size, repeat):
+    """Passages streamed by a maze generator, without any grid."""
+    def run(state):
+        n = 0
+        for passage in GENERATORS[name](size[0], size[1], 0, 0, Rng(0)):
+            n += 1
+        return n
+    return measure('carve', {'generator': name, 'size': size}, lambda: None, run, repeat)
+
+def chunks(columns, repeat):
+    """Walls of every cell read column after column east, as the endless
+    maze camera does: the memory must not grow with the columns."""
+    def run(grid):
+        for x in range(columns):
+            for y in range(grid.h):
+                grid.bits(x, y)
+        return columns
+    return measure('chunks', {'columns': columns}, lambda: ChunkedGrid(HIGH, 0), run, repeat)
+
+def pairs(game, n):
+    rng = random.Random(0)
+    return [(game.grid.random_cell(rng), game.grid.random_cell(rng)) for i in range(n)]
+
+def path_search(size, n, repeat):
+    """The generic depth-first search, between random cells."""
+    game = engine.Game(size[0], size[1], 0, None, 0)
+    game.generate()
+    def run(queries):
+        actor = engine.Actor('wolf', 0, 0)
+        for source, destination in queries:
+            engine.path_search(actor, game.grid, source, destination)
+        return len(queries)
+    return measure('path_search', {'size': size, 'queries': n}, lambda: pairs(game, n), run, repeat)
+
+def routes(size, n, repeat):
+    """The routing table lookups, between random cells."""
+    game = engine.Game(size[0], size[1], 0, None, 0)
+    game.generate()
+    def run(queries):
+        for source, destination in queries:
+            game.routes.path(source, destination)
+        return len(queries)
+    return measure('routes', {'size': size, 'queries': n}, lambda: pairs(game, n), run, repeat)
+
+def visibility(size, n, repeat):
+    """Visibility of a hidden maze built, then the cells seen and hidden
+    when the player enters random cells, walked as the fog draws them: an
+    operation is a cell drawn again."""
+    game = engine.Game(size[0], size[1], 0, None, 0)
+    game.generate()
+    rng = random.Random(0)
+    cells = [game.grid.random_cell(rng) for i in range(n)]
+    def run(cells):
+        table, h = Visibility(game.grid), game.grid.h
+        seen, drawn = 0, [0, 0] # cells hidden, seen
+        for cell in cells:
+            bits = table.at(cell.x, cell.y)
+            # the fog draws each cell seen or hidden since the last look
+            for x, y in visible_cells(seen ^ bits, h):
+                drawn[bits >> (x * h + y) & 1] += 1
+            seen = bits
+        return sum(drawn)
+    return measure('visibility', {'size': size, 'cells': n}, lambda: cells, run, repeat)
+
+def ticks(mice, n, repeat, wolves=WOLVES, hunting=False, size=(WIDTH, HIGH), seeking=False):
+    """Game ticks: actor timers, moves and collision checks."""
+    def setup():
+        game = engine.Game(size[0], size[1], 0, None, 0)
+        game.hunting = hunting
+        game.seeking = seeking
+        game.generate(mice, CHEESES, wolves)
+        return game
+    def run(game):
+        rng = random.Random(0)
+        for i in range(n):
+            game.tick([rng.choice('NSEW')])
+            if game.end_game:
+                break
+        return game.clock.ticks
+    params = {'mice': mice, 'ticks': n}
+    if size != (WIDTH, HIGH):
+        params.update(size=size)
+    if hunting:
+        params.update(wolves=wolves, hunting=True)
+    if seeking:
+        params.update(seeking=True)
+    return measure('tick', params, setup, run, repeat)
+
+def frames(screen, size, mice, n, repeat):
+    """Frames of the main loop: ticks, events, animation and display update."""
+    def setup():
+        maze = Maze(screen.get_size(), 0, None, None, 0, size)
+        maze.make_maze(screen, mice)
+        return maze
+    def run(maze):
+        rng = random.Random(0)
+        game = maze.game
+        held = []
+        for i in range(n):
+            if i % 10 == 0:
+                held = [rng.choice('NSEW')]
+            for t in range(game.clock.ticks_for(1000 // FPS)):
+                game.tick(held)
+            maze.dispatch(screen)
+            maze.animation(screen)
+            maze.flip()
+            if maze.end_game:
+                return i + 1
+        return n
+    return measure('frame', {'size': size, 'mice': mice, 'frames': n}, setup, run, repeat)
+
+def suite(repeat, quick=False):
+    pygame.init()
+    screen = pygame.display.set_mode(WINSIZE)
+    sizes = SIZES[:2] if quick else SIZES
+    results = []
+    for size in sizes:
+        results.append(generation(screen, size, repeat))
+    for size in sizes:
+        results.append(resume(screen, size, repeat))
+    for name in NAMES:
+        for size in sizes:
+            results.append(carving(name, size, repeat))
+    for columns in [1000, 10000]:
+        results.append(chunks(columns, repeat))
+    # the search time grows with the square of the maze area
+    results.append(path_search((16, 12), 100, repeat))
+    results.append(path_search((32, 24), 20, repeat))
+    for size in sizes:
+        results.append(routes(size, 1000, repeat))
+    for size in sizes:
+        results.append(visibility(size, 1000, repeat))
+    for mice in [MICE, 30]:
+        results.append(ticks(mice, 1000, repeat))
+    # the hunting wolves share one distance field
+    for wolves in [1, 10]:
+        results.append(ticks(0, 1000, repeat, wolves, True, (64, 48)))
+    # the seeking mice share the field of the cheeses
+    for mice in [30, 300]:
+        results.append(ticks(mice, 1000, repeat, size=(64, 48)))
+        results.append(ticks(mice, 1000, repeat, size=(64, 48), seeking=True))
+    for size in [(WIDTH, HIGH), (64, 48)]:
+        for mice in [MICE, 30]:
+            results.append(frames(screen, size, mice, 250, repeat))
+    pygame.quit()
+    return results
+
+def revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD']).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def key(result):
+    return result['name'] + ' ' + json.dumps(result['params'], sort_keys=True)
+
+def compare(baseline, results):
+    """Print the time of each case against the baseline one."""
+    before = dict((key(result), result) for result in baseline['results'])
+    for result in results:
+        old = before.get(key(result))
+        if old:
+            print("{:52} {:10.3f} -> {:10.3f} ms  x{:.2f}".format(
+                key(result), old['min_ms'], result['min_ms'], result['min_ms'] / max(old['min_ms'], 1e-6)))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Trap with the SDL dummy drivers.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help='skip the largest maze')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--compare', help='JSON results of a previous run')
+    args = parser.parse_args()
+
+    report = {'revision': revision(), 'python': platform.python_version(),
+              'pygame': pygame.version.ver, 'platform': platform.platform(),
+              'repeat': args.repeat, 'results': suite(args.repeat, args.quick)}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report['results'])
+    elif not args.output:
+        print(json.dumps(report, indent=1, sort_keys=True))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import pygame
+from gconstants import *
+
+# Viewport over a maze bigger than the screen.
+#
+# Cells and sprites keep their rects in maze (world) pixels; the camera is the
+# world rect shown on the screen, and translates world rects to screen ones.
+# It follows the player when the player comes closer than CAMERA_MARGIN to a
+# screen border, and never shows what lies beyond the maze.
+
+__metaclass__ = type
+
+class Camera:
+    """World area shown on the screen."""
+
+    def __init__(self, size, world):
+        self.rect = pygame.Rect((0, 0), size)
+        self.world = pygame.Rect((0, 0), world)
+
+    @property
+    def offset(self):
+        """Translation from the world to the screen."""
+        return (-self.rect.x, -self.rect.y)
+
+    def apply(self, rect):
+        """Screen rect of a world rect."""
+        return rect.move(-self.rect.x, -self.rect.y)
+
+    def clamp(self, x, y):
+        # stick to the maze top left corner when the maze is smaller than the screen
+        x = max(0, min(x, self.world.w - self.rect.w))
+        y = max(0, min(y, self.world.h - self.rect.h))
+        return x, y
+
+    def center(self, rect):
+        """Show rect in the middle of the screen, as far as the maze allows."""
+        self.rect.topleft = self.clamp(rect.centerx - self.rect.w // 2, rect.centery - self.rect.h // 2)
+
+    def follow(self, rect):
+        """Scroll to keep rect away from the screen borders.
+
+        Return the scrolling (dx, dy) in pixels, (0, 0) when the camera did
+        not move.
+
+        """
+        inner = self.rect.inflate(-2 * CAMERA_MARGIN, -2 * CAMERA_MARGIN)
+        x, y = self.rect.topleft
+        if rect.left < inner.left:
+            x -= inner.left - rect.left
+        elif rect.right > inner.right:
+            x += rect.right - inner.right
+        if rect.top < inner.top:
+            y -= inner.top - rect.top
+        elif rect.bottom > inner.bottom:
+            y += rect.bottom - inner.bottom
+        x, y = self.clamp(x, y)
+        dx, dy = x - self.rect.x, y - self.rect.y
+        self.rect.topleft = (x, y)
+        return dx, dy
+
+    def cells(self, rect=None):
+        """Range of the columns and rows of the cells overlapping rect, the
+        screen by default."""
+        rect = (rect or self.rect).clip(self.world)
+        return (range(rect.left // CELL_WIDTH, (rect.right + CELL_WIDTH - 1) // CELL_WIDTH),
+                range(rect.top // CELL_HIGH, (rect.bottom + CELL_HIGH - 1) // CELL_HIGH))
@@ -0,0 +1,98 @@
+from gconstants import *
+
+# Player input of the main loop.
+#
+# The keys down are sampled once per tick, and the arrows become moves of the
+# player, passed to Game.tick as pressed directions: a key pressed moves the
+# player on the next tick, a key held moves it again after REPEAT_DELAY, then
+# every PLAYER_TIMER. The input log records these moves, so the games replay
+# the same.
+#
+# A turn the walls do not allow yet is kept TURN_BUFFER milliseconds: the
+# player goes on the way it was going, and turns on reaching the junction.
+# The time between a key press and the display of its move is measured for
+# the profiler.
+
+__metaclass__ = type
+
+def passable(game, direction):
+    """Can the player move in direction, out of the maze by the exit too?"""
+    player, exit = game.player, game.exit
+    if direction == 'E' and exit and player.x == exit.x and player.y == exit.y:
+        return True
+    return not game.grid.wall(player.x, player.y, direction)
+
+class Controls:
+    """Moves of the player, tick by tick, from the arrow keys."""
+
+    def __init__(self, delay=REPEAT_DELAY, interval=PLAYER_TIMER, buffer=TURN_BUFFER):
+        self.delay = max(1, delay // TICK) # in tick
+        self.interval = max(1, interval // TICK)
+        self.buffer = buffer // TICK
+        self.reset()
+
+    def reset(self):
+        """Forget the input of the previous level."""
+        self.presses = [] # (direction, time in millisecond) since the last tick
+        self.intent = None # direction wanted
+        self.served = False # the player moved in the intent direction
+        self.until = 0 # last tick the player goes on toward a turn not allowed yet
+        self.expiry = 0 # tick the intent is dropped, once its key is up
+        self.heading = None # direction of the last move
+        self.ready = 0 # tick of the next move in the intent direction
+        self.step = 0 # tick of the next move going on the same way
+        self.pressed = None # time of the press waiting for its move
+        self.issued = None # time of the press of the move not shown yet
+
+    def press(self, direction, time):
+        """An arrow key went down at time."""
+        self.presses.append((direction, time))
+
+    def tick(self, game, held):
+        """Directions to press on the next tick of game, held the directions
+        of the keys down."""
+        tick = game.clock.ticks + 1
+        if self.presses:
+            # the last press tells the way wanted, played at once
+            self.intent, self.pressed = self.presses[-1]
+            self.presses = []
+            self.served = False
+            self.until = self.expiry = tick + self.buffer
+            self.ready = tick
+        elif self.intent not in held and (self.served or tick > self.expiry):
+            # a tap moves once and a turn tapped too early is given up,
+            # a key still down goes on
+            self.intent = held[0] if held else None
+            self.served = False
+            self.pressed = None
+        if not self.intent or tick < self.ready:
+            return []
+        if passable(game, self.intent):
+            direction = self.intent
+            self.served = True
+            if self.pressed is not None:
+                self.issued, self.pressed = self.pressed, None
+                self.step = tick + self.delay
+            else:
+                self.step = tick + self.interval
+        elif self.heading and tick == self.step and tick <= self.until and passable(game, self.heading):
+            # on the way to the junction, the turn is kept until the next move
+            direction = self.heading
+            self.step = tick + self.interval
+            self.expiry = max(self.expiry, self.step)
+            self.pressed = None # the turn is not the move of the press
+        else:
+            self.pressed = None
+            return []
+        self.heading = direction
+        self.ready = self.step
+        return [direction]
+
+    def shown(self, time):
+        """The frame was displayed at time: return the latency of the press
+        it shows the move of, None without such a move."""
+        if self.issued is None:
+            return None
+        latency = time - self.issued
+        self.issued = None
+        return latency
@@ -0,0 +1,23 @@
+import pygame
+
+# Drawing primitives of the game.
+#
+# The surfaces the game makes, and the blits and fills it issues, all go
+# through these functions: the profiler counts their calls while its overlay
+# is shown or its frames written. Call them through the module, as
+# drawing.blit(...), for the counting to see them.
+
+def surface(size):
+    """New surface of size, in the display pixel format."""
+    return pygame.Surface(size)
+
+def blit(target, image, dest, area=None):
+    """Draw image (its area only) on target at dest, return the rect changed."""
+    return target.blit(image, dest, area)
+
+def fill(target, color, rect=None):
+    """Fill the rect of target with color, the whole target without rect."""
+    if rect is None:
+        return target.fill(color)
+    # pygame 2 does not clip the height of a rect lying partly above the surface
+    return target.fill(color, pygame.Rect(rect).clip(target.get_rect()))
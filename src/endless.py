@@ -0,0 +1,165 @@
+from collections import OrderedDict
+from gconstants import *
+from routing import moves, wall_bits, ALL_WALLS
+from scheduler import Rng
+from generators import GENERATORS
+from engine import Game, Room, Actor, Occupancy
+
+# Endless maze, going on east without end.
+#
+# The maze is a band of h rows cut into chunks of CHUNK_WIDTH columns. Each
+# chunk is carved on its own from a seed made of the game seed and the chunk
+# rank, and joins the next chunk by one door drawn from the same seeds: every
+# chunk is a perfect maze, so the whole band is one too, and a chunk is
+# carved again the same whenever it is needed.
+#
+# Only the CHUNK_CACHE chunks used last are kept: the memory and the work of
+# a frame stay the same however far the player goes.
+
+__metaclass__ = type
+
+# direction of each move offset
+directions = dict((move, direction) for direction, move in moves.items())
+
+class ChunkedGrid:
+    """Grid of the endless maze, read as the engine.Grid of a finite one."""
+
+    def __init__(self, h, seed, iy=0, generator=GENERATOR, width=CHUNK_WIDTH, cache=CHUNK_CACHE):
+        # the renderer rects hold world pixels in 32 bits: far beyond a lifetime of play
+        self.w = 1 << 24
+        self.h = h
+        self.ix, self.iy = 0, iy
+        self.seed = seed & 0xFFFFFFFF
+        self.generator = generator
+        self.width = width
+        self.cache = cache
+        self.chunks = OrderedDict() # chunk rank: wall bits of its cells, the last used last
+        self.last = (None, None) # chunk used last, with its walls
+        self.carved = 0 # chunks carved so far, again or not
+
+    def rng(self, part):
+        return Rng((self.seed << 32) | part)
+
+    def door(self, cx):
+        """Row of the passage between the chunks cx - 1 and cx."""
+        return self.rng(cx * 2 + 1).randint(0, self.h - 1)
+
+    def carve(self, cx):
+        """Carve the chunk cx and keep it, yielding its passages in the world
+        and the door to the next chunk."""
+        w, h = self.width, self.h
+        walls = bytearray([ALL_WALLS]) * (w * h)
+        x0 = cx * w
+        for x, y, direction in GENERATORS[self.generator](w, h, 0, 0, self.rng(cx * 2)):
+            dx, dy = moves[direction]
+            walls[x * h + y] &= ~wall_bits[direction]
+            walls[(x + dx) * h + y + dy] &= ~wall_bits[directions[(-dx, -dy)]]
+            yield x0 + x, y, direction
+        if cx > 0:
+            walls[self.door(cx)] &= ~wall_bits['W']
+        y = self.door(cx + 1)
+        walls[(w - 1) * h + y] &= ~wall_bits['E']
+        self.carved += 1
+        self.chunks[cx] = walls
+        while len(self.chunks) > self.cache:
+            self.chunks.popitem(last=False)
+        self.last = (cx, walls)
+        yield x0 + w - 1, y, 'E'
+
+    def chunk(self, cx):
+        """Wall bits of the chunk cx, carved again when it was dropped."""
+        if self.last[0] == cx:
+            return self.last[1]
+        walls = self.chunks.pop(cx, None)
+        if walls is None:
+            for passage in self.carve(cx):
+                pass
+            return self.last[1]
+        self.chunks[cx] = walls # used last
+        self.last = (cx, walls)
+        return walls
+
+    def index(self, x, y):
+        return x * self.h + y
+
+    def bits(self, x, y):
+        """Wall bits of the cell (x, y)."""
+        if x < 0:
+            return ALL_WALLS
+        cx, x = divmod(x, self.width)
+        return self.chunk(cx)[x * self.h + y]
+
+    def wall(self, x, y, direction):
+        """Does a wall stand on the direction side of cell (x, y)?"""
+        return self.bits(x, y) & wall_bits[direction] != 0
+
+    def cell_at(self, x, y):
+        """Return the Room object at (x,y)."""
+        return Room(self, x, y)
+
+class EndlessGame(Game):
+    """A game in the endless maze: the player runs away from the wolves as
+    far as possible east. There is no exit, nor mice or cheeses.
+
+    The wolves wander along the corridors and jump around the player on
+    teleportation, where the chunks are in memory.
+
+    """
+
+    def __init__(self, h=HIGH, iy=None, seed=None, periods=None):
+        super(EndlessGame, self).__init__(CHUNK_WIDTH, h, 0, iy, seed, periods) # Python 2.x adaptation
+        self.grid = ChunkedGrid(h, self.seed, self.grid.iy, self.generator)
+        self.hunting = False # the distance fields need a whole maze
+
+    @property
+    def distance(self):
+        """Farthest column reached by the player."""
+        return self.farthest
+
+    def carve(self):
+        """Carve the chunks of the start, yielding their passages."""
+        for cx in range(2):
+            for passage in self.grid.carve(cx):
+                yield passage
+
+    def populate(self, mice=0, cheeses=0, wolves=WOLVES):
+        grid, rng = self.grid, self.rng
+        self.exit = None
+        self.player = Actor('player', 0, grid.iy)
+        self.farthest = 0
+        # the wolves start in the next chunk
+        self.wolves = [Actor('wolf', rng.randint(grid.width, 2 * grid.width - 1), rng.randint(0, grid.h - 1))
+                       for i in range(max(wolves, 1))]
+        self.wolf = self.wolves[0]
+        self.mice = []
+        self.cheeses = []
+        self.occupants = Occupancy(grid.h)
+        self.feeding = []
+        for actor in [self.player] + self.wolves:
+            self.occupants.add(actor, actor.x, actor.y)
+        for actor in [self.player] + self.wolves:
+            self.enter(actor)
+
+    def move(self, actor, direction):
+        moved = super(EndlessGame, self).move(actor, direction) # Python 2.x adaptation
+        if moved and actor is self.player:
+            self.farthest = max(self.farthest, actor.x)
+        return moved
+
+    def next_move(self, actor):
+        """Go on along the corridor, back only from a dead end."""
+        back = directions.get((actor.xold - actor.x, actor.yold - actor.y))
+        ways = [direction for direction in 'NSEW' if not self.grid.wall(actor.x, actor.y, direction)]
+        ahead = [direction for direction in ways if direction != back] or ways
+        return self.rng.choice(ahead) if ahead else None
+
+    def teleportation(self):
+        # a wolf jumps around the player, in the chunks used last
+        width = self.grid.width
+        wolf = self.rng.choice(self.wolves)
+        self.occupants.remove(wolf, wolf.x, wolf.y)
+        wolf.place(self.rng.randint(max(0, self.player.x - width), self.player.x + 2 * width),
+                   self.rng.randint(0, self.grid.h - 1))
+        self.occupants.add(wolf, wolf.x, wolf.y)
+        self.events.append(('teleport', wolf))
+        self.enter(wolf)
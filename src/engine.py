@@ -0,0 +1,516 @@
+import random
+from gconstants import *
+from routing import RoutingTable, DistanceField, distance_field, moves, opposite, wall_bits, ALL_WALLS
+from scheduler import Rng, Scheduler
+from generators import GENERATORS
+from workers import WorkerPool
+
+# Game logic of Trap, without any display or mixer.
+#
+# The engine owns the maze grid, the actors, the collisions and the actor
+# timers. Whatever must be seen or heard (a mouse eaten, a teleportation, the
+# end of the game...) is pushed to Game.events, so the pygame side (maze.py
+# and sprite.py) only draws and plays them. The batch runner uses the engine
+# alone to play thousands of games.
+
+__metaclass__ = type
+
+def is_present(array, value):
+    try:
+        array.index(value)
+        return True
+    except:
+        return False
+
+class TreePath:
+    def __init__(self, cell, parent, dir):
+        self.parent_direction = dir
+        self.parent = parent
+        self.cell = cell
+        self.neighbours = []
+
+    def __str__(self):
+        return (str(self.cell) + " " + str(self.parent_direction) + " " + str(self.neighbours))
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __eq__(self, other):
+        return self.cell == other.cell
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+# generic depth-first search, for mazes which are not a spanning tree
+def path_search(self, maze, start, end):
+        visited = []
+        stack = [start]
+        expanded = [False]
+        root = TreePath(start, None, None)
+        nodes = [root] # list to retrieve the nodes easier
+        ndestination = None
+
+        while stack and not ndestination:
+            # explore neighbour cells
+            if stack and not expanded[-1]:
+                cell = stack[-1]
+                expanded[-1] = True
+                visited += [cell]
+                for orientation, wall in cell.walls.items():
+                    if not wall:
+                        if orientation == 'W':
+                            next = maze.cell_at(cell.x - 1, cell.y)
+                        if orientation == 'E':
+                            next = maze.cell_at(cell.x + 1, cell.y)
+                        if orientation == 'N':
+                            next = maze.cell_at(cell.x, cell.y - 1)
+                        if orientation == 'S':
+                            next = maze.cell_at(cell.x, cell.y + 1)
+                        if not is_present(visited, next):
+                            cnode = nodes[nodes.index(TreePath(cell, None, None))] # retrieve current node from current cell
+                            nnode = TreePath(next, cnode, orientation) # create the new node (child)
+                            cnode.neighbours += [nnode] # attach the child to the parent node
+                            nodes += [nnode] # put the new node into the list
+                            stack += [next]
+                            expanded += [False]
+                        # we found the destination. it is not necessary to continue the exploration
+                        if next == end:
+                            ndestination = nnode
+                            break
+            # last visited cell
+            elif stack and expanded[-1]:
+                stack = stack[:-1]
+                expanded = expanded[:-1]
+
+        # retieve path by going up from leaf to root
+        path = []
+        node = ndestination
+        while node and node.parent_direction:
+            path += [node.parent_direction]
+            node = node.parent
+
+        self.path_stack = path
+
+class Room:
+    """A room of the maze grid, surrounded by walls to the north, east, south
+    or west.
+
+    The walls are stored in the grid: a room is only a view of its cell,
+    made on demand.
+
+    """
+
+    __slots__ = ('grid', 'x', 'y')
+
+    def __init__(self, grid, x, y):
+        self.grid = grid
+        self.x, self.y = x, y
+
+    def __str__(self):
+        return "("+ str(self.x) + "," + str(self.y) +")"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __eq__(self, other):
+        return self.x == other.x and self.y == other.y
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    @property
+    def walls(self):
+        """Wall standing in each direction, as a new dict."""
+        bits = self.grid.bits(self.x, self.y)
+        return dict((wall, bool(bits & bit)) for wall, bit in wall_bits.items())
+
+class Grid:
+    """The maze grid of w x h rooms, carved from the room (ix, iy).
+
+    The walls of the cell (x, y) are the bits of walls[x * h + y], one byte by
+    cell: a 1000 x 1000 maze takes 1 MB.
+
+    """
+
+    def __init__(self, w, h, ix=0, iy=0):
+        self.w, self.h = w, h
+        self.ix, self.iy = ix, iy
+        self.walls = bytearray([ALL_WALLS]) * (w * h)
+
+    def index(self, x, y):
+        return x * self.h + y
+
+    def cell_at(self, x, y):
+        """Return the Room object at (x,y)."""
+        return Room(self, x, y)
+
+    def bits(self, x, y):
+        """Wall bits of the cell (x, y)."""
+        return self.walls[x * self.h + y]
+
+    def random_cell(self, rng=random):
+        x = rng.randint(0, self.w - 1)
+        y = rng.randint(0, self.h - 1)
+        return Room(self, x, y)
+
+    def wall(self, x, y, direction):
+        """Does a wall stand on the direction side of cell (x, y)?"""
+        return self.walls[x * self.h + y] & wall_bits[direction] != 0
+
+    def knock_down_wall(self, x, y, direction):
+        dx, dy = moves[direction]
+        self.walls[x * self.h + y] &= ~wall_bits[direction]
+        self.walls[(x + dx) * self.h + y + dy] &= ~wall_bits[opposite[direction]]
+
+class Actor:
+    """Player, wolf or mouse: the kind tells which one."""
+
+    def __init__(self, kind, x, y):
+        self.kind = kind
+        self.x, self.y = x, y
+        self.xold, self.yold = x, y
+        self.steps = 0 # moves done so far, the renderer animates on change
+        self.moved = 0 # game time of the last move, in millisecond
+        self.path_stack = []
+        self.alive = True
+
+    def __str__(self):
+        return self.kind + " ("+ str(self.x) + "," + str(self.y) +")"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def step(self, direction):
+        self.xold, self.yold = self.x, self.y
+        dx, dy = moves[direction]
+        self.x, self.y = self.x + dx, self.y + dy
+        self.steps += 1
+
+    def place(self, x, y):
+        # jump without animation, the route from the previous cell is dropped
+        self.x, self.y = x, y
+        self.xold, self.yold = x, y
+        self.steps += 1
+        self.path_stack = []
+
+class Item:
+    """A cheese lying in the maze."""
+
+    kind = 'cheese'
+
+    def __init__(self, x, y):
+        self.x, self.y = x, y
+        self.state = 3 # 3 whole cheese, 2 ate partially, 1 crumb, 0 no left
+        self.freeze = 0
+
+class Occupancy:
+    """Spatial hash of the maze: the actors and items lying in each cell."""
+
+    def __init__(self, h):
+        self.h = h
+        self.cells = {} # cell index: list of actors and items
+
+    def at(self, x, y):
+        return self.cells.get(x * self.h + y, ())
+
+    def add(self, thing, x, y):
+        self.cells.setdefault(x * self.h + y, []).append(thing)
+
+    def remove(self, thing, x, y):
+        i = x * self.h + y
+        self.cells[i].remove(thing)
+        if not self.cells[i]:
+            del self.cells[i]
+
+# events pushed to Game.events, with the actor or item concerned
+EVENTS = ('exit', 'wolf-kill-player', 'player-eat-mouse', 'player-eat-cheese',
+          'mouse-eat-cheese', 'teleport', 'game-over')
+
+class Game:
+    """A game of Trap: the maze grid, its actors and their timers."""
+
+    def __init__(self, w=WIDTH, h=HIGH, ix=0, iy=None, seed=None, periods=None):
+        """The game is fully defined by its seed: a random start row iy is
+        drawn when none is given."""
+        self.rng = Rng(seed if seed is None else seed & 0xFFFFFFFF)
+        self.seed = self.rng.initial_seed
+        # always drawn, so that the random draws of the game do not depend on iy
+        start = self.rng.randint(0, h - 1)
+        if iy is None:
+            iy = start
+        self.grid = Grid(w, h, ix, iy)
+        # timers of the actors in millisecond
+        self.periods = {'player': PLAYER_TIMER, 'wolf': WOLF_TIMER,
+                        'mouse': MOUSE_TIMER, 'teleportation': TELEPORTATION_TIMER}
+        if periods:
+            self.periods.update(periods)
+        self.clock = Scheduler(self.periods)
+        self.log = None # scheduler.InputLog recording the player input
+        self.events = []
+        self.end_game = False
+        self.outcome = None # 'exit' or 'killed' once the game is over
+        self.hunting = HUNTING # the wolves chase the player instead of wandering
+        self.seeking = SEEKING # the mice head for the nearest cheese instead of wandering
+        self.generator = GENERATOR # name of the maze generator
+        self.workers = WorkerPool(0) # runs the long jobs, at once by default
+        self.field = None # distances to the player, shared by the hunting wolves
+        self.scent = None # distances to the cheeses left, shared by the seeking mice
+        self.chasing = None # (player cell, tick to use it, future) of the next field
+        self.steering = {} # direction held by a remote player, None for none, by actor
+
+    @property
+    def time(self):
+        return self.clock.time
+
+    def carve(self):
+        """Carve the maze grid, yielding its passages in carving order."""
+        grid = self.grid
+        carve = GENERATORS[self.generator]
+        for x, y, direction in carve(grid.w, grid.h, grid.ix, grid.iy, self.rng):
+            grid.knock_down_wall(x, y, direction)
+            yield x, y, direction
+        # the maze is a spanning tree: index the routes once for all actors
+        self.routes = RoutingTable(grid)
+        # the fields take 5 bytes by cell, made for their mode only
+        if self.hunting:
+            self.field = DistanceField(grid)
+        if self.seeking:
+            self.scent = DistanceField(grid)
+
+    def populate(self, mice=MICE, cheeses=CHEESES, wolves=WOLVES):
+        grid, rng = self.grid, self.rng
+        # set exit
+        self.exit = grid.cell_at(grid.w - 1, rng.randint(0, grid.h - 1))
+        # set player
+        self.player = Actor('player', 0, grid.iy)
+        # set wolf
+        self.wolf = Actor('wolf', grid.w - 1, rng.randint(0, grid.h - 1))
+        # set mice
+        self.mice = []
+        for i in range(mice):
+            self.mice += [Actor('mouse', rng.randint(0, grid.w - 1), rng.randint(0, grid.h - 1))]
+        # set cheeses
+        self.cheeses = []
+        for i in range(cheeses):
+            self.cheeses += [Item(rng.randint(0, grid.w - 1), rng.randint(0, grid.h - 1))]
+        # set the other wolves, in the east half as the first one
+        self.wolves = [self.wolf]
+        for i in range(wolves - 1):
+            self.wolves += [Actor('wolf', rng.randint(grid.w // 2, grid.w - 1), rng.randint(0, grid.h - 1))]
+
+        # index everything by cell, collisions are only checked on cell entry
+        self.occupants = Occupancy(grid.h)
+        self.feeding = [] # cheeses lying under an eater
+        for thing in self.cheeses + [self.player] + self.wolves + self.mice:
+            self.occupants.add(thing, thing.x, thing.y)
+        if self.seeking:
+            self.smell()
+        for actor in [self.player] + self.wolves + self.mice:
+            self.enter(actor)
+
+    def smell(self):
+        """Compute the field of the cheeses left."""
+        self.scent.update(sorted(set(self.grid.index(cheese.x, cheese.y)
+                                     for cheese in self.cheeses if cheese.state > 0)))
+
+    def generate(self, mice=MICE, cheeses=CHEESES, wolves=WOLVES):
+        """Build the whole level at once, without animation."""
+        for passage in self.carve():
+            pass
+        self.populate(mice, cheeses, wolves)
+
+    def game_over(self, outcome):
+        self.outcome = outcome
+        self.end_game = True
+        self.events.append(('game-over', None))
+
+    def move(self, actor, direction):
+        """Move actor one cell in direction, if no wall blocks it."""
+        if direction == None or self.end_game:
+            return False
+        # check if the player found the exit
+        exit = self.exit
+        if actor is self.player and direction == 'E' and exit and actor.x == exit.x and actor.y == exit.y:
+            self.events.append(('exit', actor))
+            self.game_over('exit')
+            return False
+        # check if we have wall that block access
+        if self.grid.wall(actor.x, actor.y, direction):
+            return False
+        self.occupants.remove(actor, actor.x, actor.y)
+        actor.step(direction)
+        actor.moved = self.clock.time
+        self.occupants.add(actor, actor.x, actor.y)
+        self.enter(actor)
+        return True
+
+    def next_move(self, actor):
+        if actor in self.steering:
+            actor.path_stack = [] # wander again once let go
+            return self.steering[actor]
+        if actor.kind == 'wolf' and self.hunting:
+            return self.hunt(actor)
+        if actor.kind == 'mouse' and self.seeking and self.scent.sources:
+            return self.seek(actor)
+        if actor.path_stack == []:
+            source = self.grid.cell_at(actor.x, actor.y)
+            # choose random cell to go
+            destination = self.grid.random_cell(self.rng)
+            while source == destination:
+                destination = self.grid.random_cell(self.rng)
+            # the route is read from the maze routing table, no search needed
+            actor.path_stack = self.routes.path(source, destination)
+        if actor.path_stack == []:
+            return None
+        return actor.path_stack.pop()
+
+    def hunt(self, wolf):
+        """Next move of wolf toward the player, read from the distance field."""
+        return self.field.move(wolf.x, wolf.y)
+
+    def seek(self, mouse):
+        """Next move of mouse toward the nearest cheese, read from the
+        field of the cheeses: None on a cheese, to eat it."""
+        mouse.path_stack = [] # wander again once the cheeses are eaten
+        return self.scent.move(mouse.x, mouse.y)
+
+    def chase(self):
+        """Keep the distance field of the hunting wolves up to date.
+
+        The field is computed again by the workers only when the player
+        entered another cell, and the wolves use it FIELD_LATENCY ticks later:
+        the game plays the same whatever the time the workers took.
+
+        """
+        source = self.grid.index(self.player.x, self.player.y)
+        if self.chasing and self.chasing[0] != source:
+            # the player left the cell before its field was used
+            self.chasing[2].cancel()
+            self.chasing = None
+        if not self.chasing and self.field.sources != (source,):
+            self.chasing = (source, self.clock.ticks + FIELD_LATENCY,
+                            self.workers.submit(distance_field, self.grid, [source]))
+        if self.chasing and self.clock.ticks >= self.chasing[1]:
+            self.field = self.chasing[2].result()
+            self.chasing = None
+
+    def teleportation(self):
+        # pickup active actors
+        actors = list(self.wolves)
+        for mouse in self.mice:
+            if mouse.alive:
+                actors += [mouse]
+        # random pickup one actor and teleport it to a random position
+        actor = self.rng.choice(actors)
+        self.occupants.remove(actor, actor.x, actor.y)
+        actor.place(self.rng.randint(0, self.grid.w - 1), self.rng.randint(0, self.grid.h - 1))
+        self.occupants.add(actor, actor.x, actor.y)
+        self.events.append(('teleport', actor))
+        self.enter(actor)
+
+    def fire(self, timer, held):
+        if timer == 'player':
+            for direction in held:
+                self.move(self.player, direction)
+        if timer == 'wolf':
+            for wolf in self.wolves:
+                self.move(wolf, self.next_move(wolf))
+        if timer == 'mouse':
+            for mouse in self.mice:
+                if mouse.alive:
+                    self.move(mouse, self.next_move(mouse))
+        if timer == 'teleportation':
+            self.teleportation()
+
+    def tick(self, held=(), pressed=()):
+        """Play one tick of the game clock.
+
+        The player first makes the moves pressed since the last tick, then
+        the timers which expire move their actors (the player follows the held
+        directions) and the eaters lying on cheeses are fed.
+
+        """
+        if self.end_game:
+            return
+        fired = self.clock.advance()
+        if self.log:
+            self.log.record(self.clock.ticks, held, pressed)
+        for direction in pressed:
+            self.move(self.player, direction)
+        if self.hunting:
+            self.chase()
+        for timer in fired:
+            if self.end_game:
+                return
+            self.fire(timer, held)
+        self.collisions()
+
+    def still(self):
+        """Milliseconds the game stays the same without input: until the
+        next timer, none while an eater lies on a cheese."""
+        return 0 if self.feeding else self.clock.wait()
+
+    # Collision detections
+
+    def enter(self, actor):
+        """Check the collisions of actor with what lies in the cell it entered."""
+        player = self.player
+        for other in list(self.occupants.at(actor.x, actor.y)):
+            if self.end_game or not actor.alive:
+                return
+            # wolf kill player
+            if actor is player and other.kind == 'wolf':
+                self.events.append(('wolf-kill-player', other))
+                self.game_over('killed')
+            if actor.kind == 'wolf' and other is player:
+                self.events.append(('wolf-kill-player', actor))
+                self.game_over('killed')
+            # player eat mouse
+            if actor is player and other.kind == 'mouse':
+                self.eat_mouse(other)
+            if other is player and actor.kind == 'mouse':
+                self.eat_mouse(actor)
+            # the cheese is eaten tick after tick while an eater stays on it
+            if other.kind == 'cheese' and other.state > 0 and actor.kind != 'wolf':
+                if other not in self.feeding:
+                    self.feeding.append(other)
+
+    def eat_mouse(self, mouse):
+        mouse.alive = False
+        self.occupants.remove(mouse, mouse.x, mouse.y)
+        self.events.append(('player-eat-mouse', mouse))
+
+    def collisions(self):
+        """Feed the eaters lying on a cheese, once per tick."""
+        for cheese in list(self.feeding):
+            eaters = [actor for actor in self.occupants.at(cheese.x, cheese.y)
+                      if actor.kind == 'player' or actor.kind == 'mouse']
+            if not eaters or cheese.state <= 0:
+                self.feeding.remove(cheese)
+                continue
+            # player eat cheese, then mouse eat cheese
+            if self.player in eaters:
+                self.eat_cheese(cheese, self.player)
+            for eater in eaters:
+                if eater is not self.player and cheese.state > 0:
+                    self.eat_cheese(cheese, eater)
+
+    def eat_cheese(self, cheese, eater):
+        if cheese.freeze <= 0:
+            if eater is self.player:
+                cheese.state = 0 # player eat cheese in one time
+                self.events.append(('player-eat-cheese', cheese))
+            else:
+                cheese.state -= 1 # mouse eat cheese piece by piece
+                self.events.append(('mouse-eat-cheese', cheese))
+            cheese.freeze = CHEESE_FREEZE // TICK # disable hit box during CHEESE_FREEZE
+            if cheese.state <= 0 and self.seeking and self.scent.sources:
+                self.eaten(cheese)
+        else:
+            cheese.freeze -= 1
+
+    def eaten(self, cheese):
+        # the last bite: the seeking mice head for the other cheeses
+        i = self.grid.index(cheese.x, cheese.y)
+        if not any(other.state > 0 and self.grid.index(other.x, other.y) == i for other in self.cheeses):
+            self.scent.remove(i)
@@ -0,0 +1,74 @@
+import pygame
+from gconstants import *
+from routing import Visibility, cells
+import drawing
+
+# Fog of the hidden maze.
+#
+# The player sees only along the straight corridors of its cell: the other
+# cells, with the exit, cheeses and actors lying there, are hidden. The fog is
+# an overlay of the camera view, as the maze layer below the sprites: each
+# frame covers the screen areas it changed with it, once the sprites are
+# drawn. When the player enters a cell, only the cells seen from one of the
+# two cells are drawn again, whatever the maze size.
+
+__metaclass__ = type
+
+FOG = (0, 0, 0)
+CLEAR = (255, 0, 255) # transparent color key
+
+class Fog:
+    """Overlay hiding the cells out of the player sight."""
+
+    def __init__(self, grid, camera, size):
+        self.visibility = Visibility(grid)
+        self.camera = camera
+        self.h = grid.h
+        self.cell = None # index of the cell the player looks from
+        self.seen = 0 # bitset of the cells seen from there
+        self.surface = drawing.surface(size)
+        self.surface.set_colorkey(CLEAR)
+        drawing.fill(self.surface, FOG)
+
+    def rect(self, x, y):
+        """World rect of the cell (x, y)."""
+        return pygame.Rect(x * CELL_WIDTH, y * CELL_HIGH, CELL_WIDTH, CELL_HIGH)
+
+    def fill(self, x, y, seen):
+        drawing.fill(self.surface, CLEAR if seen else FOG, self.rect(x, y).move(self.camera.offset))
+
+    def look(self, x, y):
+        """The player stands in (x, y): lift and lay the fog on the cells
+        seen or hidden since the last look, and return their world rects."""
+        i = x * self.h + y
+        if i == self.cell:
+            return []
+        self.cell = i
+        seen = self.visibility.at(x, y)
+        changed = seen ^ self.seen
+        self.seen = seen
+        view = self.camera.rect
+        rects = []
+        for x, y in cells(changed, self.h):
+            rect = self.rect(x, y)
+            if rect.colliderect(view):
+                self.fill(x, y, seen >> (x * self.h + y) & 1)
+                rects.append(rect)
+        return rects
+
+    def paint(self, rect):
+        """Draw the fog on the world rect, come into the camera view."""
+        columns, rows = self.camera.cells(rect)
+        for x in columns:
+            for y in rows:
+                self.fill(x, y, self.seen >> (x * self.h + y) & 1)
+
+    def scroll(self, dx, dy):
+        """Move the overlay with the camera, before the strips come into
+        view are painted."""
+        self.surface.scroll(-dx, -dy)
+
+    def cover(self, screen, rects):
+        """Lay the fog over the screen rects."""
+        for rect in rects:
+            drawing.blit(screen, self.surface, rect, rect)
@@ -1,23 +1,83 @@
-# DESKTOP SIZE SCREEN
-# CELL_WIDTH = 80
-# CELL_HIGH = 80
-# WALL_THICKNESS = 10
-# SPRITE_ZOOM = 40
-# COLLISION_BOX = 20
-
-# GCW ZERO OPTIMAL SIZE SCREEN
-CELL_WIDTH = 20
-CELL_HIGH = 20
-WALL_THICKNESS = 3
-SPRITE_ZOOM = 10
-COLLISION_BOX = 5
-
-FRAME = 5
+import os
+from profiles import current
+
+# SIZES OF THE DISPLAY PROFILE, see profiles.py
+PROFILE, _profile = current()
+CELL_WIDTH, CELL_HIGH = _profile['cell']
+WALL_THICKNESS = _profile['wall']
+SPRITE_ZOOM = _profile['sprite']
+
+MOVE_TIME = 200 # in millisecond, a sprite glides from a cell to the next
 
 # GCW ZERO / DESKTOP OPTIMAL SIZE GRID OF MAZE
+# a bigger maze scrolls: the camera follows the player
 WIDTH = 16
 HIGH = 12
 
-# 320 x 240
+# 320 x 240 on the GCW Zero
 # https://wiki.dingoonity.org/index.php?title=Dingux:OpenDingux:Development#Building_OpenDingux_from_sources
-WINSIZE = (CELL_WIDTH * WIDTH, CELL_HIGH * HIGH)
\ No newline at end of file
+WINSIZE = _profile['screen']
+
+CAMERA_MARGIN = _profile['margin'] # in pixel, the camera scrolls when the player comes closer to a screen border
+
+# the images scaled for each profile are kept there, or None to scale them on every run
+ASSET_CACHE = os.path.join(os.path.expanduser('~'), '.trap', 'assets')
+
+# ACTOR TIMERS IN MILLISECOND
+PLAYER_TIMER = 400
+WOLF_TIMER = 400
+MOUSE_TIMER = 300
+TELEPORTATION_TIMER = 10000 # every 10s, we pickup one mouse or wolf in random and we teleport it
+
+# PLAYER INPUT IN MILLISECOND
+REPEAT_DELAY = _profile['repeat'] # a key held moves the player again after it, then every PLAYER_TIMER
+TURN_BUFFER = 300 # a turn the walls do not allow yet waits for the next junction
+
+FPS = _profile['fps'] # while something moves on screen
+IDLE_FRAMES = 1 # still frames before the main loop sleeps until the next change
+IDLE_WAIT = 80 # in millisecond, the longest sleep, shorter than MAX_TICKS ticks
+
+# the game logic advances by fixed ticks, whatever the frame rate
+TICK = 20 # in millisecond
+MAX_TICKS = 5 # ticks played at most by frame, a late frame slows the game down
+CHEESE_FREEZE = 400 # in millisecond, between two bites of the same cheese
+
+# frame profiler, the L button (tab) shows its overlay
+PROFILE_WINDOW = 50 # frames of the overlay statistics
+PROFILE_CSV = None # file where the profile of every frame is written, or None
+
+# the level left on quit is saved there and resumed on the next run, or None
+SAVE_FILE = os.path.join(os.path.expanduser('~'), '.trap', 'resume.sav')
+
+# directory where the input log of each game is saved to be replayed, or None
+RECORD_DIR = None
+
+# show the maze building progression of the first level, next ones are instant
+MAZE_ANIMATION = True
+GENERATION_STEPS = 8 # carved cells shown by frame
+GENERATOR = 'dfs' # maze generator: dfs, kruskal, prim, wilson or eller
+HIDDEN = False # hidden maze: the player sees along the straight corridors only
+
+# endless maze, going on east chunk after chunk
+ENDLESS = False
+CHUNK_WIDTH = 16 # in cell
+CHUNK_CACHE = 8 # chunks kept in memory, the farthest used are carved again on return
+
+GAME_OVER_DELAY = 2000 # in millisecond, before the next level
+
+# ACTORS BY LEVEL
+MICE = 3
+CHEESES = 5
+WOLVES = 1
+HUNTING = False # the wolves chase the player instead of wandering
+SEEKING = False # the mice head for the nearest cheese instead of wandering
+
+# two players over the network, see netplay.py
+NET_PORT = 7777
+NET_PING = 1000 # in millisecond, between two round trip measures
+NET_RETRY = 1000 # in millisecond, between two connection attempts of the client
+FIELD_LATENCY = 2 # in tick, the hunting wolves follow the player cell this late
+
+# threads running the long jobs out of the main loop
+WORKERS = 2 # the next level and the hunting field
+WORKER_QUEUE = 8 # jobs waiting at most
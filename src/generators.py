@@ -0,0 +1,212 @@
+import random
+from array import array
+
+# Maze generators.
+#
+# A generator carves a perfect maze (a spanning tree of the grid) of w x h
+# cells and yields its passages lazily as (x, y, direction): the wall of
+# cell (x, y) in direction is knocked down. The same stream builds a level at
+# once, shows it carved frame after frame, or feeds a headless consumer.
+# Every random draw comes from rng, so a maze is defined by the seed of rng.
+#
+# The generators are registered by name in GENERATORS; the names are stored
+# by their rank in the input logs, so a new generator is appended to them.
+
+DELTA = [('W', (-1, 0)),
+         ('E', (1, 0)),
+         ('S', (0, 1)),
+         ('N', (0, -1))]
+
+NAMES = [] # registration order
+GENERATORS = {}
+
+def register(name):
+    """Decorator adding a generator to the registry."""
+    def add(generator):
+        NAMES.append(name)
+        GENERATORS[name] = generator
+        return generator
+    return add
+
+@register('dfs')
+def depth_first(w, h, ix=0, iy=0, rng=random):
+    """Carve a w x h maze from (ix, iy) with the depth-first algorithm
+    described at https://scipython.com/blog/making-a-maze/
+
+    Long winding corridors with few dead ends.
+
+    """
+    # Total number of cells.
+    n = w * h
+    visited = bytearray(n)
+    visited[ix * h + iy] = 1
+    carved = 1
+    cell_stack = array('i', [ix * h + iy]) # cell indexes
+
+    while carved < n:
+        x, y = divmod(cell_stack[-1], h)
+        neighbours = []
+        for direction, (dx, dy) in DELTA:
+            x2, y2 = x + dx, y + dy
+            if 0 <= x2 < w and 0 <= y2 < h and not visited[x2 * h + y2]:
+                neighbours.append((direction, x2 * h + y2))
+
+        if not neighbours:
+            # We've reached a dead end: backtrack.
+            cell_stack.pop()
+            continue
+
+        # Choose a random neighbouring cell and move to it.
+        direction, j = rng.choice(neighbours)
+        visited[j] = 1
+        carved += 1
+        cell_stack.append(j)
+        yield x, y, direction
+
+@register('kruskal')
+def kruskal(w, h, ix=0, iy=0, rng=random):
+    """Knock down the walls in random order, each one joining two parts of
+    the maze not connected yet (union-find).
+
+    Short corridors and many dead ends, spread over the whole maze: the
+    start cell does not matter.
+
+    """
+    n = w * h
+    parent = array('i', range(n))
+    # east walls as cell index * 2, south walls as cell index * 2 + 1
+    walls = array('i', [i * 2 for i in range(n - h)])
+    walls.extend(i * 2 + 1 for i in range(n) if i % h != h - 1)
+    rng.shuffle(walls)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]] # path halving
+            i = parent[i]
+        return i
+
+    joined = 1
+    for wall in walls:
+        if joined == n:
+            return
+        i = wall >> 1
+        j = i + 1 if wall & 1 else i + h
+        a, b = find(i), find(j)
+        if a != b:
+            parent[a] = b
+            joined += 1
+            x, y = divmod(i, h)
+            yield x, y, 'S' if wall & 1 else 'E'
+
+@register('prim')
+def prim(w, h, ix=0, iy=0, rng=random):
+    """Grow the maze from (ix, iy) through a random wall of its frontier.
+
+    Many short dead ends radiating from the start cell.
+
+    """
+    visited = bytearray(w * h)
+    frontier = array('i') # walls as cell index * 4 + rank in DELTA
+
+    def add(i):
+        visited[i] = 1
+        x, y = divmod(i, h)
+        for k, (direction, (dx, dy)) in enumerate(DELTA):
+            x2, y2 = x + dx, y + dy
+            if 0 <= x2 < w and 0 <= y2 < h and not visited[x2 * h + y2]:
+                frontier.append(i * 4 + k)
+
+    add(ix * h + iy)
+    while frontier:
+        k = rng.randrange(len(frontier))
+        wall = frontier[k]
+        frontier[k] = frontier[-1]
+        frontier.pop()
+        i, k = divmod(wall, 4)
+        direction, (dx, dy) = DELTA[k]
+        x, y = divmod(i, h)
+        j = (x + dx) * h + y + dy
+        if not visited[j]:
+            add(j)
+            yield x, y, direction
+
+@register('wilson')
+def wilson(w, h, ix=0, iy=0, rng=random):
+    """Join every cell to the maze grown from (ix, iy) by a loop-erased
+    random walk.
+
+    Every spanning tree is as likely as the others: no bias in the corridor
+    shapes, at the price of long walks while the maze is small.
+
+    """
+    n = w * h
+    joined = bytearray(n)
+    joined[ix * h + iy] = 1
+    exits = bytearray(n) # last exit of each cell in the walk, as rank in DELTA
+    for start in range(n):
+        # walk until the maze, a loop is erased when the walk leaves a cell again
+        i = start
+        while not joined[i]:
+            x, y = divmod(i, h)
+            while True:
+                k = rng.randrange(4)
+                dx, dy = DELTA[k][1]
+                if 0 <= x + dx < w and 0 <= y + dy < h:
+                    break
+            exits[i] = k
+            i = (x + dx) * h + y + dy
+        # carve the walk left without loop
+        i = start
+        while not joined[i]:
+            joined[i] = 1
+            x, y = divmod(i, h)
+            direction, (dx, dy) = DELTA[exits[i]]
+            yield x, y, direction
+            i = (x + dx) * h + y + dy
+
+@register('eller')
+def eller(w, h, ix=0, iy=0, rng=random):
+    """Carve column after column from the west with the Eller algorithm.
+
+    Only the sets of cells connected in the current column are kept: the
+    memory depends on h only, whatever the maze width.
+
+    """
+    sets = array('i', range(h)) # set of each cell of the column
+    for x in range(w):
+        last = x == w - 1
+        members = {}
+        for y in range(h):
+            members.setdefault(sets[y], []).append(y)
+        # join random neighbours of different sets, all of them in the last column
+        for y in range(h - 1):
+            a, b = sets[y], sets[y + 1]
+            if a != b and (last or rng.random() < 0.5):
+                if len(members[a]) < len(members[b]):
+                    a, b = b, a
+                for k in members[b]:
+                    sets[k] = a
+                members[a] += members.pop(b)
+                yield x, y, 'S'
+        if last:
+            return
+        # every set goes on east by one passage at least, the other cells
+        # start new sets in the next column
+        following = array('i', [-1]) * h
+        for y in range(h):
+            rows = members.pop(sets[y], None)
+            if rows is None:
+                continue
+            east = [k for k in rows if rng.random() < 0.5] or [rng.choice(rows)]
+            for k in sorted(east):
+                following[k] = sets[y]
+                yield x, k, 'E'
+        used = bytearray(h)
+        for k in range(h):
+            if following[k] >= 0:
+                used[following[k]] = 1
+        free = (s for s in range(h) if not used[s])
+        for k in range(h):
+            if following[k] < 0:
+                following[k] = next(free)
+        sets = following
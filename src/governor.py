@@ -0,0 +1,39 @@
+import pygame
+from gconstants import *
+
+# Frame rate governor of the main loop.
+#
+# The frames run at FPS while something moves on screen. After IDLE_FRAMES
+# still frames (no sprite gliding, no key held, the maze built) the loop
+# sleeps instead: until the next change of the game, at most IDLE_WAIT, and
+# wakes up at once on an event. Nothing is drawn nor displayed meanwhile, the
+# handheld saves its battery.
+
+__metaclass__ = type
+
+WAKE = pygame.USEREVENT # timer event ending a sleep
+
+class Governor:
+    """Duration of the frames of the main loop."""
+
+    def __init__(self, fps=FPS, frames=IDLE_FRAMES, longest=IDLE_WAIT):
+        self.fps = fps
+        self.frames = frames
+        self.longest = longest
+        self.still = 0 # still frames in a row
+
+    def frame(self, clock, busy, quiet):
+        """End a frame, busy when something moved on screen or may move on
+        the next tick, quiet the milliseconds nothing changes otherwise, and
+        return its duration in millisecond."""
+        self.still = 0 if busy else self.still + 1
+        timeout = min(int(quiet), self.longest)
+        if self.still < self.frames or timeout <= 0:
+            return clock.tick(self.fps)
+        pygame.time.set_timer(WAKE, timeout)
+        event = pygame.event.wait()
+        pygame.time.set_timer(WAKE, 0)
+        pygame.event.clear(WAKE)
+        if event.type != WAKE:
+            pygame.event.post(event) # for the next frame
+        return clock.tick()
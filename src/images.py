@@ -0,0 +1,75 @@
+import hashlib
+import os
+import struct
+import pygame
+from gconstants import *
+
+# Image cache shared by every sprite of the process.
+#
+# Each asset is loaded, scaled and converted to the display pixel format once
+# for a given size; all the sprites showing it share the same surface, so it
+# must never be drawn on.
+#
+# The scaled images are also kept on disk in ASSET_CACHE as raw pixels, named
+# after the hash of their asset: the next runs read them without decoding nor
+# scaling, and a changed asset is scaled again.
+
+cache = {}
+
+# width, height and alpha of the raw pixels
+HEADER = struct.Struct('>HHB')
+
+def cached(file, size):
+    """Path of the image of file scaled to size in the disk cache."""
+    with open(file, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(file))[0]
+    return os.path.join(ASSET_CACHE, '{}-{}x{}-{}.raw'.format(name, size[0], size[1], digest))
+
+def save(image, path):
+    directory, name = os.path.split(path)
+    alpha = image.get_flags() & pygame.SRCALPHA != 0
+    data = HEADER.pack(image.get_width(), image.get_height(), alpha)
+    data += pygame.image.tostring(image, 'RGBA' if alpha else 'RGB')
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # drop the images of the previous versions of the asset
+        prefix = name.rsplit('-', 1)[0] + '-'
+        for old in os.listdir(directory):
+            if old.startswith(prefix) and old.endswith('.raw'):
+                os.remove(os.path.join(directory, old))
+        # a worker may load the same image: the file appears whole or not at all
+        temporary = '{}.{}'.format(path, os.getpid())
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.rename(temporary, path)
+    except (IOError, OSError):
+        pass # read-only: scaled again on the next run
+
+def scaled(file, size):
+    """Image of file scaled to size, from the disk cache when there."""
+    path = cached(file, size) if ASSET_CACHE else None
+    if path and os.path.exists(path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        w, h, alpha = HEADER.unpack_from(data)
+        return pygame.image.fromstring(data[HEADER.size:], (w, h), 'RGBA' if alpha else 'RGB')
+    image = pygame.transform.scale(pygame.image.load(file), size)
+    if path:
+        save(image, path)
+    return image
+
+def load(file, size=(SPRITE_ZOOM, SPRITE_ZOOM)):
+    """Return the image of file scaled to size."""
+    key = (file, size)
+    if key not in cache:
+        image = scaled(file, size)
+        # converting needs the display mode to be set
+        if pygame.display.get_surface():
+            if image.get_flags() & pygame.SRCALPHA:
+                image = image.convert_alpha()
+            else:
+                image = image.convert()
+        cache[key] = image
+    return cache[key]
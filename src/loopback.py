@@ -0,0 +1,120 @@
+#! /usr/bin/env python
+__author__ = 'Joris Quenee'
+
+# Check the two-player sync over the loopback interface.
+#
+# Headless games are played on a netplay.Host, a few ticks by frame as
+# main.main would, and a netplay.Client on 127.0.0.1 keeps its copy: after
+# every frame the copy must show the actors, cheeses and game over of the
+# host. The client steers the wolf now and then, and joins again after
+# REJOIN ticks. The summary tells the size of the whole state and the bytes
+# sent by tick, the whole states and pings included:
+#
+#   ./src/loopback.py --games 10 --ticks 4000
+
+import argparse
+import random
+import sys
+import time
+import engine
+from generators import NAMES
+from netplay import Host, Client, DIRECTIONS
+from gconstants import *
+
+WAIT = 1.0 # in second, for the client to catch up with the host
+REJOIN = 100 # ticks
+
+def view(game):
+    """What the client displays of game."""
+    return ([(actor.x, actor.y, actor.alive) for actor in [game.player] + game.wolves + game.mice],
+            [cheese.state for cheese in game.cheeses], game.end_game, game.outcome)
+
+def until(condition, host, client):
+    """Poll both sides until condition() holds, return False after WAIT."""
+    deadline = time.time() + WAIT
+    while not condition():
+        if time.time() > deadline:
+            return False
+        client.poll()
+        client.flush()
+        host.poll()
+        host.flush()
+        time.sleep(0.001)
+    return True
+
+def sync(host, seed, ticks, hunting=HUNTING, seeking=SEEKING, generator=GENERATOR):
+    """Play a game on host and return (mismatches, whole state size,
+    bytes sent, ticks played)."""
+    game = engine.Game(WIDTH, HIGH, 0, None, seed)
+    game.hunting = hunting
+    game.seeking = seeking
+    game.generator = generator
+    game.generate(MICE, CHEESES, WOLVES)
+    host.start(game)
+    client = Client('127.0.0.1', host.port)
+    rng = random.Random(seed)
+    mismatches = 0
+    sent = 0 # by the previous links
+    try:
+        if not until(lambda: client.game is not None, host, client):
+            return 1, host.full, 0, 0
+        full = host.full
+        played = 0
+        rejoined = False
+        while played < ticks and not game.end_game:
+            if played >= REJOIN and not rejoined:
+                # the client joins again, from a whole state
+                rejoined = True
+                sent += host.link.sent
+                client.close()
+                client = Client('127.0.0.1', host.port)
+                if not until(lambda: client.game is not None, host, client):
+                    return mismatches + 1, full, sent, played
+            host.poll()
+            for i in range(rng.randint(0, 3)):
+                held = [rng.choice(DIRECTIONS)] if rng.random() < 0.3 else []
+                game.tick((), held)
+                host.tick()
+                played += 1
+            if rng.random() < 0.5:
+                game.events = [] # dispatched by the maze
+            if rng.random() < 0.05:
+                direction = rng.choice([None] + list(DIRECTIONS))
+                client.steer(direction)
+                if not until(lambda: game.steering.get(game.wolf, '') == direction, host, client):
+                    mismatches += 1
+            host.flush()
+            if not until(lambda: view(client.game) == view(game), host, client):
+                mismatches += 1
+                break
+        return mismatches, full, sent + host.link.sent, played
+    finally:
+        client.close()
+        host.poll() # the wolf goes back to the game
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the two-player sync of Trap over the loopback interface.')
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ticks', type=int, default=4000, help='ticks by game at most')
+    parser.add_argument('--hunting', action='store_true', default=HUNTING, help='the wolves chase the player')
+    parser.add_argument('--seeking', action='store_true', default=SEEKING, help='the mice head for the cheeses')
+    parser.add_argument('--generator', choices=NAMES, default=GENERATOR, help='maze generator')
+    args = parser.parse_args()
+
+    host = Host(0, '127.0.0.1') # any free port
+    try:
+        results = [sync(host, args.seed + i, args.ticks, args.hunting, args.seeking, args.generator)
+                   for i in range(args.games)]
+    finally:
+        host.close()
+    mismatches = sum(result[0] for result in results)
+    played = sum(result[3] for result in results)
+    print("{} games, {} ticks, {} mismatches".format(len(results), played, mismatches))
+    sizes = [result[1] for result in results]
+    print("whole state {} to {} bytes".format(min(sizes), max(sizes)))
+    print("sent {:.2f} bytes by tick".format(sum(result[2] for result in results) / float(max(played, 1))))
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
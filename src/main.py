@@ -2,23 +2,158 @@
 __author__ = 'Joris Quenee'
 
 import os
+import sys
 import time
+import argparse
+import profiles
+profiles.select() # before the constants are read
+import gconstants
 from maze import *
+from endless import EndlessGame
+from scheduler import InputLog
+import savegame
+import drawing
+from profiler import Profiler
+from controls import Controls
+from governor import Governor
+from workers import WorkerPool
+from netplay import Host, Client
 import pygame
 from pygame.locals import *
 from random import *
 
-def draw_maze(screen):
-    # green is background
-    screen.fill((0, 255, 0))
-    # start point
-    starty = randint(0, HIGH - 1)
-    # build the maze
-    maze = Maze(WINSIZE, 0, starty)
-    maze.make_maze(screen)
-    return maze
-
-def main():
+# arrow keys and the direction they move the player
+ARROWS = [(K_LEFT, 'W'), (K_RIGHT, 'E'), (K_UP, 'N'), (K_DOWN, 'S')]
+
+# game states, the main loop never waits inside one of them
+GENERATING = 'generating' # the maze is built, step by step when animated
+PLAYING = 'playing'
+DYING = 'dying' # the wolf caught the player
+LEVEL_COMPLETE = 'level-complete' # the player found the exit
+
+def level(sounds):
+    # the start point is drawn from the game seed
+    if ENDLESS:
+        return Maze(WINSIZE, 0, None, sounds, game=EndlessGame(), hidden=False)
+    return Maze(WINSIZE, 0, None, sounds, None, (WIDTH, HIGH))
+
+def new_maze(screen, sounds, animate=False):
+    # the maze is built by the GENERATING state
+    maze = level(sounds)
+    return maze, maze.generation(screen, animate)
+
+def next_level(sounds):
+    # built by a worker while the current level is played
+    return level(sounds).prepare()
+
+def next_maze(screen, upcoming):
+    # the level built in the background is displayed at once,
+    # nothing is left to the GENERATING state
+    maze = upcoming.result()
+    maze.show(screen)
+    return maze, iter(())
+
+def start(maze, profiler, workers, sounds):
+    """Play maze from now on, and return the future of the next level."""
+    profiler.attach(maze.game)
+    # the jobs of the previous level are dropped
+    workers.reset()
+    maze.game.workers = workers
+    return workers.submit(next_level, sounds)
+
+def resume(screen, sounds):
+    # the level left on the last quit, displayed at once
+    try:
+        game = savegame.read(SAVE_FILE)
+        os.remove(SAVE_FILE)
+    except (IOError, OSError, ValueError):
+        return None
+    maze = Maze(WINSIZE, 0, None, sounds, game=game).resume()
+    maze.show(screen)
+    return maze, iter(())
+
+def score(screen, distance):
+    # the run in the endless maze, shown until the next level
+    if not pygame.font:
+        return None
+    text = pygame.font.Font(None, 24).render('{} cells'.format(distance), True, (255, 255, 255), (0, 0, 0))
+    return drawing.blit(screen, text, text.get_rect(center=screen.get_rect().center))
+
+def save_game(maze):
+    # a finite level still played is resumed on the next run
+    if SAVE_FILE and not ENDLESS and not maze.end_game:
+        directory = os.path.dirname(SAVE_FILE)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        savegame.write(maze.game, SAVE_FILE)
+
+def save_log(maze):
+    # keep the player input to replay the game with replay.py
+    if maze.game.log and maze.game.log.length:
+        maze.game.log.save(os.path.join(RECORD_DIR, 'trap-{}.log'.format(maze.game.seed)))
+        maze.game.log = None
+
+def join(screen, sounds, profiler, clock, client):
+    """Display the game of the host from now on, the arrows steer its first
+    wolf."""
+    maze = None
+    hud = None
+    done = 0
+    dt = 0
+    while not done:
+        for e in pygame.event.get():
+            if e.type == pygame.KEYDOWN:
+                if e.key == QUIT or e.key == K_ESCAPE:
+                    done = 1
+                if e.key == K_TAB:
+                    profiler.visible = not profiler.visible
+        game = client.poll()
+        if game:
+            # a new level, or the host was joined again
+            maze = Maze(WINSIZE, 0, None, sounds, game=game, hidden=False).resume()
+            maze.show(screen)
+            hud = None
+        profiler.lap('events')
+
+        if maze:
+            if hud:
+                maze.repaint(screen, hud.move(maze.camera.rect.topleft))
+                hud = None
+                profiler.lap('hud')
+            pressed = pygame.key.get_pressed()
+            held = [direction for key, direction in ARROWS if pressed[key]]
+            client.steer(held[0] if held else None)
+            # the host plays the ticks, the clock glides the sprites meanwhile
+            if not maze.end_game:
+                scheduler = maze.game.clock
+                scheduler.ticks += scheduler.ticks_for(dt)
+            profiler.lap('ticks')
+            maze.dispatch(screen)
+            profiler.lap('dispatch')
+            maze.animation(screen)
+            profiler.lap('animation')
+            if profiler.visible:
+                hud = profiler.draw(screen)
+                if hud:
+                    maze.dirty.append(hud)
+                profiler.lap('hud')
+            maze.flip()
+        client.flush()
+        profiler.lap('flip')
+        dt = clock.tick(FPS)
+        profiler.lap('wait')
+        profiler.frame(PLAYING if maze else GENERATING)
+    client.close()
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description='Trap, find the exit of the maze.')
+    parser.add_argument('--host', action='store_true', help='play with a second player steering the wolf')
+    parser.add_argument('--join', metavar='ADDRESS', help='steer the wolf of the game hosted at ADDRESS')
+    parser.add_argument('--port', type=int, default=NET_PORT)
+    args = parser.parse_args(argv)
+    if args.host and (ENDLESS or args.join):
+        parser.error('--host plays a finite maze, alone on this side')
+
     pygame.init()
     pygame.mouse.set_visible(0) # disable mouse cursor
     # pygame.mixer.pre_init(44100, -16, 2, 2048)
@@ -30,92 +165,144 @@ def main():
     pygame.display.set_caption('Trap')
 
     clock = pygame.time.Clock()
-    maze = draw_maze(screen)
+    profiler = Profiler(PROFILE_CSV)
+    sounds = SoundBank() # load all sounds once
+    if args.join:
+        client = Client(args.join, args.port)
+        profiler.net = client
+        join(screen, sounds, profiler, clock, client)
+        profiler.close()
+        return
+    net = Host(args.port) if args.host else None # the second player, over the network
+    profiler.net = net
+    workers = WorkerPool()
+    resumed = SAVE_FILE and not ENDLESS and resume(screen, sounds)
+    # the building of a hidden maze is not shown, pygame.locals has its own HIDDEN
+    maze, building = resumed or new_maze(screen, sounds, MAZE_ANIMATION and not gconstants.HIDDEN)
+    upcoming = start(maze, profiler, workers, sounds)
+    state = GENERATING
+    hud = None # screen area of the profiler overlay
 
     # by default the key repeat is disabled
     # call set_repeat() to enable it
-    # pygame.key.set_repeat(300, 1000) / don't work as expected. replaced by USEREVENT
-    
-    PLAYER_EVENT, t = pygame.USEREVENT+4, 400 # in millisecond
-    pygame.time.set_timer(PLAYER_EVENT, t)
-
-    WOLF_EVENT, t = pygame.USEREVENT+1, 400 # in millisecond
-    pygame.time.set_timer(WOLF_EVENT, t)
-
-    MOUSE_EVENT, t = pygame.USEREVENT+2, 300 # in millisecond
-    pygame.time.set_timer(MOUSE_EVENT, t)
-
-    TELEPORTATION_EVENT, t = pygame.USEREVENT+3, 10000 # every 10s, we pickup one mouse or wolf in random and we teleport it
-    pygame.time.set_timer(TELEPORTATION_EVENT, t)
+    # pygame.key.set_repeat(300, 1000) / don't work as expected. replaced by the controls
+    controls = Controls()
+    governor = Governor()
 
     done = 0
-    threads = []
+    dt = 0 # duration of the last frame in millisecond
     while not done:
+        busy = True # something moves on screen, or may move on the next tick
+        quiet = 0 # in millisecond, nothing changes on screen until then
 
         for e in pygame.event.get():
 
             if e.type == pygame.KEYDOWN:
                 if e.key == QUIT or e.key == K_ESCAPE:
+                    save_log(maze)
+                    if state == PLAYING:
+                        save_game(maze)
                     done = 1
                 if e.key == K_RETURN:
-                    maze = draw_maze(screen) # re-init the game
+                    save_log(maze)
+                    maze, building = next_maze(screen, upcoming) # re-init the game
+                    upcoming = start(maze, profiler, workers, sounds)
+                    state = GENERATING
+                    hud = None
                     pygame.event.clear() # clear event queue
-                #if e.key == K_LEFT or e.key == K_RIGHT or e.key == K_UP or e.key == K_DOWN:
-                #    pygame.event.post(pygame.event.Event(PLAYER_EVENT))
-                if e.key == K_LEFT:
-                    maze.player.move(maze, 'W', screen)
-                if e.key == K_RIGHT:
-                    maze.player.move(maze, 'E', screen)
-                if e.key == K_UP:
-                    maze.player.move(maze, 'N', screen)
-                if e.key == K_DOWN:
-                    maze.player.move(maze, 'S', screen)
-
-            if e.type == TELEPORTATION_EVENT:
-                maze.teleportation(screen)
-
-            if e.type == WOLF_EVENT:
-                wd = maze.wolf.next_move(maze)
-                maze.wolf.move(maze, wd, screen)
-            if e.type == MOUSE_EVENT:
-                for mouse in maze.mice:
-                    if mouse.alive:
-                        md = mouse.next_move(maze)
-                        mouse.move(maze, md, screen)
-
-            if e.type == PLAYER_EVENT:
-                if pygame.key.get_pressed()[K_LEFT]:
-                    maze.player.move(maze, 'W', screen)
-                if pygame.key.get_pressed()[K_RIGHT]:
-                    maze.player.move(maze, 'E', screen)
-                if pygame.key.get_pressed()[K_UP]:
-                    maze.player.move(maze, 'N', screen)
-                if pygame.key.get_pressed()[K_DOWN]:
-                    maze.player.move(maze, 'S', screen)
-
-
-        # Animation	Handling #
-        if maze.end_game:
-            maze = draw_maze(screen)
-
-        maze.wolf.animation(screen)
-        maze.player.animation(screen)
-        for mouse in maze.mice:
-            if mouse.alive:
-                mouse.animation(screen)
-        for cheese in maze.cheeses:
-            if cheese.state > 0:
-                cheese.draw(screen)
-
-        # Collision detections
-        maze.wolf_kill_player(screen)
-        maze.player_eat_mouse(screen)
-        maze.player_eat_cheese(screen)
-        maze.mouse_eat_cheese(screen)
+                    break
+                if e.key == K_TAB:
+                    profiler.visible = not profiler.visible
+                if state == PLAYING:
+                    for key, direction in ARROWS:
+                        if e.key == key:
+                            controls.press(direction, pygame.time.get_ticks()) # played on the next tick
+        if net:
+            net.poll()
+        profiler.lap('events')
+
+        if hud and state != GENERATING:
+            # the sprites below the overlay are drawn again by the animation
+            maze.repaint(screen, hud.move(maze.camera.rect.topleft))
+            hud = None
+            profiler.lap('hud')
+
+        if state == GENERATING:
+            try:
+                for i in range(GENERATION_STEPS):
+                    next(building)
+            except StopIteration:
+                state = PLAYING
+                dt = 0
+                controls.reset()
+                if net:
+                    net.start(maze.game)
+                # a resumed game is not replayed from its seed, nor a game
+                # with a second player
+                if RECORD_DIR and not ENDLESS and not net and maze.game.clock.ticks == 0:
+                    maze.game.log = InputLog(maze.game)
+            profiler.lap('generation')
+
+        if state == PLAYING:
+            # actor timers and collision detections, tick by tick: the keys
+            # change on the event pump only, so they are read once per frame
+            pressed = pygame.key.get_pressed()
+            held = [direction for key, direction in ARROWS if pressed[key]]
+            for i in range(maze.game.clock.ticks_for(dt)):
+                maze.game.tick((), controls.tick(maze.game, held))
+                if net:
+                    net.tick()
+            profiler.lap('ticks')
+
+            maze.dispatch(screen)
+            profiler.lap('dispatch')
+            maze.animation(screen)
+            profiler.lap('animation')
+            # the direction of the second player comes without event
+            busy = bool(held) or controls.intent is not None or maze.animating() or bool(net and net.link)
+            quiet = maze.game.still()
+
+            # Animation	Handling #
+            if maze.end_game:
+                state = DYING if maze.game.outcome == 'killed' else LEVEL_COMPLETE
+                delay = GAME_OVER_DELAY
+                save_log(maze)
+                if ENDLESS:
+                    shown = score(screen, maze.game.distance)
+                    if shown:
+                        maze.dirty.append(shown)
+
+        elif state == DYING or state == LEVEL_COMPLETE:
+            # the last frame stays on screen, then the next level is built
+            delay -= dt
+            busy, quiet = False, delay
+            if delay <= 0:
+                maze, building = next_maze(screen, upcoming)
+                upcoming = start(maze, profiler, workers, sounds)
+                state = GENERATING
+                hud = None
+
+        if profiler.visible and state != GENERATING:
+            hud = profiler.draw(screen)
+            if hud:
+                maze.dirty.append(hud)
+            profiler.lap('hud')
 
      	# FPS / Frame Rate #
-        pygame.display.update()
-        clock.tick(25)
+        maze.flip()
+        latency = controls.shown(pygame.time.get_ticks())
+        if latency is not None:
+            profiler.input(latency)
+        if net:
+            net.flush()
+        profiler.lap('flip')
+        dt = governor.frame(clock, busy, quiet)
+        profiler.lap('wait')
+        profiler.frame(state)
+    profiler.close()
+    workers.close()
+    if net:
+        net.close()
 
 if __name__ == '__main__':
-    main()
+    main(sys.argv[1:])
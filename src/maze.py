@@ -1,8 +1,11 @@
-import random
 import pygame
 import time
-import threading
+import engine
 from sprite import *
+from sounds import SoundBank
+from camera import Camera
+import drawing
+import fog
 
 # Create a maze using the depth-first algorithm described at
 # https://scipython.com/blog/making-a-maze/
@@ -13,30 +16,24 @@ __metaclass__ = type
 class Cell:
     """A cell in the maze.
 
-    A maze "Cell" is a point in the grid which may be surrounded by walls to
-    the north, east, south or west.
+    A maze "Cell" draws a room of the engine grid, which may be surrounded by
+    walls to the north, east, south or west. It is a view made on demand: the
+    walls stay in the grid, and the cell is painted with plain fills.
 
     """
     # cell sprite size (room + wall)
     # room = 20 / wall = 5
     w, h = CELL_WIDTH, CELL_HIGH
     wl = WALL_THICKNESS
+    tiles = {} # image of the cell square of each wall bits, made on first use
 
-    # A wall separates a pair of cells in the N-S or W-E directions.
-    wall_pairs = {'N': 'S', 'S': 'N', 'E': 'W', 'W': 'E'}
-
-    def __init__(self, x, y):
-        """Initialize the cell at (x,y). At first it is surrounded by walls."""
-        self.x, self.y = x, y
-        self.walls = {'N': True, 'S': True, 'E': True, 'W': True}
-        # unvisited cell is green as the wall
-        self.image = pygame.Surface([self.w - self.wl * 2, self.h - self.wl * 2])
-        # green
-        self.image.fill((0, 255, 0))
+    def __init__(self, room):
+        """Initialize the cell of room."""
+        self.room = room
+        self.x, self.y = room.x, room.y
         # shape to draw
-        self.rect = self.image.get_rect()
-        self.rect.x = (x * self.w) + self.wl
-        self.rect.y = (y * self.h) + self.wl
+        self.rect = pygame.Rect((self.x * self.w) + self.wl, (self.y * self.h) + self.wl,
+                                self.w - self.wl * 2, self.h - self.wl * 2)
 
     def __str__(self):
         return "("+ str(self.x) + "," + str(self.y) +")"
@@ -50,211 +47,369 @@ class Cell:
     def __ne__(self, other):
         return not self.__eq__(other)
 
-    def has_all_walls(self):
-        """Does this cell still have all its walls?"""
-        return all(self.walls.values())
-
-    def knock_down_wall(self, other, wall):
-        """Knock down the wall between cells self and other."""
-        self.walls[wall] = False
-        other.walls[Cell.wall_pairs[wall]] = False
-        # visited cell is bleu and the wall as green
-        self.fillw(wall)
-        other.fill()
-
-    # fill image without wall
-    def fill(self):
-        self.image = pygame.Surface([self.w - self.wl * 2, self.h - self.wl * 2])
-        self.image.fill((0, 0, 255))
-        self.rect = self.image.get_rect()
-        self.rect.x = (self.x * self.w) + self.wl
-        self.rect.y = (self.y * self.h) + self.wl
+    @property
+    def walls(self):
+        return self.room.walls
 
-    # fill image with wall included
-    def fillw(self, wall):
+    # fill room without wall, return the area drawn
+    def fill(self, surface, offset=(0, 0)):
+        drawing.fill(surface, (0, 0, 255), self.rect.move(offset)) # bleu
+        return self.rect
+
+    # fill room with wall included, return the area drawn
+    def fillw(self, surface, wall, offset=(0, 0)):
+        rect = self.rect.copy()
+        if wall == 'N':
+            rect.y -= self.wl * 2
         if wall == 'N' or wall == 'S':
-            self.image = pygame.Surface([self.w - self.wl * 2, self.h])
-        if wall == 'E' or wall == 'W':
-            self.image = pygame.Surface([self.w, self.h - self.wl * 2])
-        # bleu
-        self.image.fill((0, 0, 255))
-        # shape to draw inside the surface
-        self.rect = self.image.get_rect()
-        self.rect.x = (self.x * self.w) + self.wl
-        if wall == 'E':
-            self.rect.x = (self.x * self.w) + self.wl
+            rect.h += self.wl * 2
         if wall == 'W':
-            self.rect.x = (self.x * self.w) - self.wl
+            rect.x -= self.wl * 2
+        if wall == 'E' or wall == 'W':
+            rect.w += self.wl * 2
+        drawing.fill(surface, (0, 0, 255), rect.move(offset)) # bleu
+        return rect
 
-        self.rect.y = (self.y * self.h) + self.wl
-        if wall == 'N':
-            self.rect.y = (self.y * self.h) - self.wl
-        if wall == 'S':
-            self.rect.y = (self.y * self.h) + self.wl
+    @classmethod
+    def tile(cls, bits):
+        """Image of a cell square with the walls of bits.
+
+        An open side is bleu up to the square border: the neighbour cell
+        draws the other half of the passage.
 
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
+        """
+        if bits not in cls.tiles:
+            w, h, wl = cls.w, cls.h, cls.wl
+            image = drawing.surface((w, h))
+            drawing.fill(image, (0, 255, 0)) # green
+            drawing.fill(image, (0, 0, 255), (wl, wl, w - wl * 2, h - wl * 2)) # bleu
+            sides = {'N': (wl, 0, w - wl * 2, wl), 'S': (wl, h - wl, w - wl * 2, wl),
+                     'W': (0, wl, wl, h - wl * 2), 'E': (w - wl, wl, wl, h - wl * 2)}
+            for wall, side in sides.items():
+                if not bits & engine.wall_bits[wall]:
+                    drawing.fill(image, (0, 0, 255), side) # bleu
+            cls.tiles[bits] = image
+        return cls.tiles[bits]
+
+    def paint(self, surface, offset=(0, 0)):
+        """Draw the whole cell square from the walls of the room."""
+        bits = self.room.grid.bits(self.x, self.y)
+        drawing.blit(surface, self.tile(bits), (self.x * self.w + offset[0], self.y * self.h + offset[1]))
 
 class Exit(Cell):
     def __init__(self, x, y):
         self.x, self.y = x, y
-        self.image = pygame.Surface([self.w, self.h - self.wl * 2])
-        self.image.fill((0, 0, 255)) # bleu
+        self.image = drawing.surface([self.w, self.h - self.wl * 2])
+        drawing.fill(self.image, (0, 0, 255)) # bleu
         # shape to draw
         self.rect = self.image.get_rect()
         self.rect.x = (x * self.w) + 2 * self.wl
         self.rect.y = (y * self.h) + self.wl
 
-    def player_found(self, player, maze, screen):
-        # remove player before to exit game
-        maze.cell_at(self.x, self.y).fill()
-        maze.cell_at(self.x, self.y).draw(screen)
-        pygame.display.update()
-        maze.game_over()
+    def draw(self, screen, offset=(0, 0)):
+        drawing.blit(screen, self.image, self.rect.move(offset))
 
-def game_over_sound():
-    sound = pygame.mixer.Sound('assets/game-over.wav')
-    sound.play()
+    def player_found(self, maze, screen):
+        # remove player before to exit game, wherever its move to the exit
+        # shows it: the next animations leave it out
+        maze.repaint(screen, maze.cell_at(self.x, self.y).rect)
+        maze.repaint(screen, maze.player.rect)
 
 class Maze:
-    """A Maze, represented as a grid of cells."""
+    """A Maze, represented as a grid of cells.
+
+    The game itself is played by engine.Game: the maze draws its grid and
+    actors, and plays the sounds of its events. The maze may be bigger than
+    the screen: the camera follows the player, and only the cells and actors
+    in its view are drawn or animated.
+
+    """
 
-    def __init__(self, size, ix=0, iy=0):
+    def __init__(self, size, ix=0, iy=None, sounds=None, seed=None, cells=None, game=None, hidden=HIDDEN):
         """Initialize the maze grid.
-        The maze consists of nx x ny cells and will be constructed starting
-        at the cell indexed at (ix, iy).
+        The maze consists of nx x ny cells (as many as fit in the screen size
+        by default) and will be constructed starting at the cell indexed at
+        (ix, iy), a random row of the game seed by default. The events are
+        played with the sounds bank. A game made beforehand, as an endless
+        one, replaces the new game. A hidden maze shows only the cells the
+        player sees, it must be finite.
 
         """
-        self.w, self.h = size[0] // Cell.w, size[1] // Cell.h
-        self.ix, self.iy = ix, iy
-        self.grid = [[Cell(x, y) for y in range(self.h)] for x in range(self.w)]
-        self.end_game = False
+        self.sounds = sounds or SoundBank()
+        nx, ny = cells or (size[0] // Cell.w, size[1] // Cell.h)
+        self.game = game or engine.Game(nx, ny, ix, iy, seed)
+        self.w, self.h = self.game.grid.w, self.game.grid.h
+        self.ix, self.iy = ix, self.game.grid.iy
+        self.camera = Camera(size, (self.w * Cell.w, self.h * Cell.h))
+        # the player starts at the west border, on the generation start row
+        self.camera.center(self.cell_at(0, self.iy).rect)
+        self.dirty = [] # screen areas changed since the last display update
+        self.hidden = hidden
+        self.fog = None
+
+    @property
+    def end_game(self):
+        return self.game.end_game
 
     def game_over(self):
-        t = threading.Thread(name='game-over', target=game_over_sound)
-        t.start()
-        t.join()
-        pygame.time.delay(2000)
-        self.end_game = True
-
-    def teleportation(self, screen):
-        # pickup active actors
-        actors = []
-        actors += [self.wolf]
-        for mouse in self.mice:
-            if mouse.alive:
-                actors += [mouse]
-        
-        # random pickup one actor
-        actor = random.choice(actors)
-
-        # teleport
-        actor.teleport(screen)
-
+        # after the wolf howl, if any
+        self.sounds.play('game-over', queue=True)
 
-    def wolf_kill_player(self, screen):
-        if self.wolf.rect.x - COLLISION_BOX <= self.player.rect.x <= self.wolf.rect.x + COLLISION_BOX and self.wolf.rect.y - COLLISION_BOX <= self.player.rect.y <= self.wolf.rect.y + COLLISION_BOX:
-            self.wolf.draw(screen)
-            pygame.display.update()
-            self.wolf.yell()
-            self.game_over()
-
-    def player_eat_mouse(self, screen):
-        for mouse in self.mice:
-            if mouse.alive and self.player.rect.x == mouse.rect.x and self.player.rect.y == mouse.rect.y:
-                self.player.draw(screen)
-                pygame.display.update()
-                self.player.chewing_mouse()
-                mouse.alive = False
-
-    def player_eat_cheese(self, screen):
+    def cell_at(self, x, y):
+        """Return the Cell object at (x,y)."""
+        return Cell(self.game.grid.cell_at(x, y))
+
+    def repaint(self, screen, rect):
+        """Restore the maze layer on the world rect, the actors above are
+        drawn again by the next animation."""
+        rect = self.camera.apply(rect).clip(screen.get_rect())
+        if rect:
+            drawing.blit(screen, self.background, rect, rect)
+            self.dirty.append(rect)
+
+    def paint(self, rect):
+        """Draw the maze layer on the world rect from the maze grid."""
+        offset = self.camera.offset
+        columns, rows = self.camera.cells(rect)
+        if not columns or not rows:
+            return
+        for x in columns:
+            for y in rows:
+                self.cell_at(x, y).paint(self.background, offset)
+        if self.fog:
+            self.fog.paint(rect)
+        # the exit and cheeses belong to the maze layer, in the cells painted
+        area = pygame.Rect(columns[0] * Cell.w, rows[0] * Cell.h, len(columns) * Cell.w, len(rows) * Cell.h)
+        if self.exit and self.exit.rect.colliderect(area):
+            self.exit.draw(self.background, offset)
         for cheese in self.cheeses:
-            if cheese.state > 0:
-                cheese.eat_me(self.player, screen)
-
-    def mouse_eat_cheese(self, screen):
+            if cheese.rect.colliderect(area):
+                cheese.draw(self.background, offset)
+
+    def scroll(self, screen, dx, dy):
+        """Move the maze layer with the camera, then redraw the screen."""
+        view = self.camera.rect
+        self.background.scroll(-dx, -dy)
+        if self.fog:
+            self.fog.scroll(dx, dy)
+        # paint the strips of the maze which came into view
+        if dx:
+            self.paint(pygame.Rect(view.right - dx if dx > 0 else view.left, view.top, abs(dx), view.h))
+        if dy:
+            self.paint(pygame.Rect(view.left, view.bottom - dy if dy > 0 else view.top, view.w, abs(dy)))
+        drawing.blit(screen, self.background, (0, 0))
+        for sprite in self.actors():
+            if sprite.rect.colliderect(view):
+                sprite.draw(screen, self.camera.offset)
+        self.dirty = [screen.get_rect()]
+        if self.fog:
+            self.fog.cover(screen, self.dirty)
+
+    def actors(self):
+        sprites = list(self.wolves)
+        # the player left by the exit
+        if self.game.outcome != 'exit':
+            sprites += [self.player]
         for mouse in self.mice:
             if mouse.alive:
-                for cheese in self.cheeses:
-                    if cheese.state > 0:
-                        cheese.eat_me(mouse, screen)
+                sprites += [mouse]
+        return sprites
+
+    def animation(self, screen):
+        if self.fog:
+            # the cells seen or hidden since the player entered its cell
+            for rect in self.fog.look(self.game.player.x, self.game.player.y):
+                self.repaint(screen, rect)
+        view = self.camera.rect
+        sprites = []
+        moving = []
+        for sprite in self.actors():
+            # the actors out of view jump to their cell
+            if not sprite.visible(view):
+                if sprite.animating():
+                    sprite.skip()
+                continue
+            sprites.append(sprite)
+            if sprite.animating():
+                moving.append(sprite)
+        # erase the moving sprites, then draw them at their next position with
+        # the still sprites they overlapped
+        for sprite in moving:
+            self.repaint(screen, sprite.rect)
+        clock = self.game.clock
+        now = clock.time + clock.lag # the frame shows the time not played yet too
+        for sprite in moving:
+            sprite.refresh(now)
+        dx, dy = self.camera.follow(self.player.rect)
+        if dx or dy:
+            self.scroll(screen, dx, dy)
+            return
+        offset = self.camera.offset
+        for sprite in moving:
+            self.dirty.append(self.camera.apply(sprite.rect))
+        drawn = []
+        for sprite in sprites:
+            rect = self.camera.apply(sprite.rect)
+            if sprite in moving or rect.collidelist(self.dirty) != -1:
+                sprite.draw(screen, offset)
+                drawn.append(rect)
+        if self.fog:
+            # the still sprites drawn again stick out of the dirty areas
+            self.fog.cover(screen, self.dirty + drawn)
+
+    def animating(self):
+        """Is a sprite in view still gliding to its cell?"""
+        view = self.camera.rect
+        return any(sprite.animating() and sprite.visible(view) for sprite in self.actors())
+
+    def dispatch(self, screen):
+        """Show and play the events of the game since the last frame."""
+        offset = self.camera.offset
+        for event, subject in self.game.events:
+            if event == 'exit':
+                self.exit.player_found(self, screen)
+            if event == 'wolf-kill-player':
+                wolf = self.sprites[subject]
+                wolf.draw(screen, offset)
+                self.dirty.append(self.camera.apply(wolf.rect))
+                self.sounds.play('wolf')
+            if event == 'player-eat-mouse':
+                self.repaint(screen, self.sprites[subject].rect)
+                self.player.draw(screen, offset)
+                self.sounds.play(event)
+            if event == 'player-eat-cheese' or event == 'mouse-eat-cheese':
+                cheese = self.sprites[subject]
+                cheese.update_state()
+                # the cheese belongs to the maze layer
+                drawing.fill(self.background, (0, 0, 255), cheese.rect.move(offset)) # bleu
+                cheese.draw(self.background, offset)
+                self.repaint(screen, cheese.rect)
+                self.sounds.play(event)
+            if event == 'teleport':
+                # the next animation draws the actor at its new position
+                self.repaint(screen, self.sprites[subject].rect)
+                self.sounds.play(event)
+            if event == 'game-over':
+                self.game_over()
+        self.game.events = []
+
+    def flip(self):
+        """Push the changed areas of the screen to the display."""
+        pygame.display.update(self.dirty)
+        self.dirty = []
+
+    def bake(self):
+        """Add the exit and cheeses to the maze drawn in the background."""
+        offset = self.camera.offset
+        if self.exit:
+            self.exit.draw(self.background, offset)
+        for cheese in self.cheeses:
+            cheese.draw(self.background, offset)
+
+    def show(self, screen):
+        """Display the whole view of the level."""
+        drawing.blit(screen, self.background, (0, 0))
+        for sprite in self.actors():
+            if sprite.rect.colliderect(self.camera.rect):
+                sprite.draw(screen, self.camera.offset)
+        if self.fog:
+            self.fog.look(self.game.player.x, self.game.player.y)
+            self.fog.cover(screen, [screen.get_rect()])
+        self.dirty.append(screen.get_rect())
+
+    def generation(self, screen, animate=True, mice=MICE, cheeses=CHEESES, wolves=WOLVES):
+        """Build the maze, drawing the carved passages in the background,
+        then populate it.
+
+        The background covers the camera view. With animate, the two cells
+        touched by each carving step in view are shown and the generator
+        yields, so the main loop displays the building progression frame
+        after frame; otherwise the level is built at once.
 
-    def cell_at(self, x, y):
-        """Return the Cell object at (x,y)."""
-        return self.grid[x][y]
-
-    def random_cell(self):
-        x = random.randint(0, self.w - 1)
-        y = random.randint(0, self.h - 1)
-        return self.grid[x][y]
-
-    def draw(self, screen):
-        for row in self.grid:
-            for cell in row:
-                cell.draw(screen)
-
-    def find_valid_neighbours(self, cell):
-        """Return a list of unvisited neighbours to cell."""
-
-        delta = [('W', (-1,0)),
-                 ('E', (1,0)),
-                 ('S', (0,1)),
-                 ('N', (0,-1))]
-        neighbours = []
-        for direction, (dx,dy) in delta:
-            x2, y2 = cell.x + dx, cell.y + dy
-            if (0 <= x2 < self.w) and (0 <= y2 < self.h):
-                neighbour = self.cell_at(x2, y2)
-                if neighbour.has_all_walls():
-                    neighbours.append((direction, neighbour))
-        return neighbours
-
-    def make_maze(self, screen):
-        # Total number of cells.
-        n = self.w * self.h
-        cell_stack = []
-        current_cell = self.cell_at(self.ix, self.iy)
-        # Total number of visited cells during maze construction.
-        nv = 1
-
-        while nv < n:
-            neighbours = self.find_valid_neighbours(current_cell)
-
-            if not neighbours:
-                # We've reached a dead end: backtrack.
-                current_cell = cell_stack.pop()
+        """
+        view, offset = self.camera.rect, self.camera.offset
+        self.background = drawing.surface(screen.get_size())
+        # green is background
+        drawing.fill(self.background, (0, 255, 0))
+        if animate:
+            self.repaint(screen, view)
+            yield
+        for x, y, direction in self.game.carve():
+            cell = self.cell_at(x, y)
+            dx, dy = engine.moves[direction]
+            next_cell = self.cell_at(x + dx, y + dy)
+            if not (view.colliderect(cell.rect) or view.colliderect(next_cell.rect)):
                 continue
+            # visited cell is bleu and the wall as green
+            passage = cell.fillw(self.background, direction, offset)
+            next_cell.fill(self.background, offset)
+            if animate:
+                # display here the maze building progression
+                self.repaint(screen, passage)
+                self.repaint(screen, next_cell.rect)
+                yield
+        self.populate(mice, cheeses, wolves)
+        self.bake()
+        self.show(screen)
+
+    def populate(self, mice=MICE, cheeses=CHEESES, wolves=WOLVES):
+        """Place the actors and items of the game, and make their sprites."""
+        self.game.populate(mice, cheeses, wolves)
+        self.make_sprites()
+
+    def make_sprites(self):
+        game = self.game
+
+        # set exit, an endless maze has none
+        self.exit = Exit(game.exit.x, game.exit.y) if game.exit else None
+        # set cheeses
+        self.cheeses = []
+        for i in range(len(game.cheeses)):
+            self.cheeses += [Cheese("assets/cheese.png", game.cheeses[i])]
 
-            # Choose a random neighbouring cell and move to it.
-            direction, next_cell = random.choice(neighbours)
-            current_cell.knock_down_wall(next_cell, direction)
-            cell_stack.append(current_cell)
-            current_cell = next_cell
-            # display here the maze building progression
-            self.draw(screen)
-            pygame.display.update()
-            pygame.time.wait(5)
-            nv += 1
-
-        # set exit
-        self.exit = Exit(self.w - 1, random.randint(0, self.h - 1))
-        self.exit.draw(screen)
         # set player
-        self.player = Player("assets/player.png", 0, self.iy)
-        self.player.draw(screen)
+        self.player = Player("assets/player.png", game.player)
 
-        # set wolf
-        starty = random.randint(0, self.h - 1)
-        self.wolf = Wolf("assets/wolf.png", self.w - 1, starty)
-        self.wolf.draw(screen)
+        # set wolves
+        self.wolves = [Wolf("assets/wolf.png", wolf) for wolf in game.wolves]
+        self.wolf = self.wolves[0]
         # set mice
         self.mice = []
-        for i in range(3):
-            self.mice += [Mouse("assets/mouse.png", random.randint(0, self.w - 1), random.randint(0, self.h - 1))]
-            self.mice[i].draw(screen)
+        for i in range(len(game.mice)):
+            self.mice += [Mouse("assets/mouse.png", game.mice[i])]
 
-        # set cheeses
-        self.cheeses = []
-        for i in range(5):
-            self.cheeses += [Cheese("assets/cheese.png", random.randint(0, self.w - 1), random.randint(0, self.h - 1))]
-            self.cheeses[i].draw(screen)
\ No newline at end of file
+        # sprite drawing each actor and item of the game
+        self.sprites = {}
+        for sprite in [self.player] + self.wolves + self.mice + self.cheeses:
+            self.sprites[sprite.actor] = sprite
+
+        # the fog of a hidden maze, over the maze layer of the camera view
+        if self.hidden:
+            self.fog = fog.Fog(game.grid, self.camera, self.background.get_size())
+
+    def prepare(self, mice=MICE, cheeses=CHEESES, wolves=WOLVES):
+        """Build the whole level away from the screen, and return the maze.
+
+        The game, its sprites and the maze layer of the camera view are made
+        without drawing on the screen: a worker prepares the next level while
+        the current one is played, then show() displays it in one frame.
+
+        """
+        self.game.generate(mice, cheeses, wolves)
+        return self.resume()
+
+    def resume(self):
+        """Make the sprites and the maze layer of the camera view of a game
+        built already, as a loaded save, and return the maze."""
+        player = self.game.player
+        self.camera.center(self.cell_at(player.x, player.y).rect)
+        self.background = drawing.surface(self.camera.rect.size)
+        drawing.fill(self.background, (0, 255, 0)) # green
+        self.make_sprites()
+        self.paint(self.camera.rect)
+        return self
+
+    def make_maze(self, screen, mice=MICE, cheeses=CHEESES, wolves=WOLVES):
+        """Build the whole maze at once."""
+        for step in self.generation(screen, False, mice, cheeses, wolves):
+            pass
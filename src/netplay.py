@@ -0,0 +1,426 @@
+import errno
+import select
+import socket
+import struct
+import time
+from collections import deque
+from gconstants import *
+from routing import moves
+import savegame
+
+# Two players over the network: the host plays the game, the client displays
+# it and steers the first wolf.
+#
+# The host sends the changes of its game tick after tick, never the whole
+# game: the cells the actors moved to, the cheese states and the events, for
+# the sounds. A move to the next cell costs one byte, a tick without change
+# nothing. The whole state is only sent when the client (re)connects and on a
+# new level, as a save of savegame.py: about 250 bytes for a 16 x 12 maze. The
+# client sends back the direction it holds, the wolf follows it on its timer.
+#
+# The messages go over TCP: a delta only makes sense after the previous ones,
+# and a lost Wi-Fi frame is sent again by the network stack instead of the
+# game. Both sides poll their socket once per frame without blocking, count
+# the bytes they send and receive by second and time the round trip with a
+# ping every NET_PING.
+#
+# A message: kind (1 byte), payload length (varint), payload.
+#   F     whole state, a save of the game
+#   D     deltas: for each tick with changes, the ticks since the previous one
+#         and the record count (varints), then the records
+#   I     direction held by the client: rank in 'NSEW', 4 for none
+#   P, Q  ping and pong: time in millisecond (4 bytes)
+#
+# A record starts with the varint rank << 3 | kind. The rank is the one of
+# the actor in player, wolves, mice, of the cheese, or of the event subject
+# in player, wolves, mice, cheeses plus 1 (0 for none).
+#   0-3   the actor moved to the next cell, in the direction 'NSEW'[kind]
+#   4     the actor jumped to x, y (varints)
+#   5     the cheese has state left (1 byte)
+#   6     the mouse was eaten
+#   7     event of the subject (1 byte, rank in EVENTS)
+
+__metaclass__ = type
+
+clock = getattr(time, 'perf_counter', time.time)
+
+DIRECTIONS = 'NSEW'
+# direction of each move offset
+STEPS = dict((moves[direction], k) for k, direction in enumerate(DIRECTIONS))
+PLACE, CHEESE, DEAD, EVENT = 4, 5, 6, 7
+EVENTS = ('exit', 'wolf-kill-player', 'player-eat-mouse', 'player-eat-cheese', 'mouse-eat-cheese',
+          'teleport', 'game-over')
+NONE = 4 # no direction held
+PING = struct.Struct('>I')
+
+def varint(data, n):
+    """Append n to data, 7 bits by byte."""
+    while n >= 0x80:
+        data.append((n & 0x7F) | 0x80)
+        n >>= 7
+    data.append(n)
+
+def read_varint(data, i):
+    """Value of the varint at data[i], and the index after it."""
+    n, shift = 0, 0
+    while data[i] & 0x80:
+        n |= (data[i] & 0x7F) << shift
+        shift += 7
+        i += 1
+    return n | (data[i] << shift), i + 1
+
+def actors(game):
+    return [game.player] + game.wolves + game.mice
+
+def snapshot(game):
+    """What the client displays of game, to find what changed."""
+    return ([(actor.x, actor.y, actor.steps, actor.alive) for actor in actors(game)],
+            [cheese.state for cheese in game.cheeses])
+
+def delta(game, last, events):
+    """Records of the changes of game since its snapshot last, with the
+    events, and their count."""
+    data = bytearray()
+    n = 0
+    cells, states = last
+    for rank, actor in enumerate(actors(game)):
+        x, y, steps, alive = cells[rank]
+        if actor.steps != steps:
+            step = STEPS.get((actor.x - x, actor.y - y))
+            if actor.steps == steps + 1 and step is not None and (actor.xold, actor.yold) == (x, y):
+                varint(data, rank << 3 | step)
+            else:
+                varint(data, rank << 3 | PLACE)
+                varint(data, actor.x)
+                varint(data, actor.y)
+            n += 1
+        if alive and not actor.alive:
+            varint(data, rank << 3 | DEAD)
+            n += 1
+    for rank, cheese in enumerate(game.cheeses):
+        if cheese.state != states[rank]:
+            varint(data, rank << 3 | CHEESE)
+            data.append(max(cheese.state, 0))
+            n += 1
+    if events:
+        things = actors(game) + game.cheeses
+        ranks = dict((id(thing), i + 1) for i, thing in enumerate(things))
+        for event, subject in events:
+            varint(data, ranks.get(id(subject), 0) << 3 | EVENT)
+            data.append(EVENTS.index(event))
+            n += 1
+    return data, n
+
+def patch(game, data, i, n):
+    """Play the n records at data[i] on the game of the client, and return
+    the index after them."""
+    players = actors(game)
+    for k in range(n):
+        head, i = read_varint(data, i)
+        rank, kind = head >> 3, head & 7
+        if kind < PLACE:
+            actor = players[rank]
+            actor.step(DIRECTIONS[kind])
+            actor.moved = game.clock.time
+        elif kind == PLACE:
+            x, i = read_varint(data, i)
+            y, i = read_varint(data, i)
+            players[rank].place(x, y)
+        elif kind == CHEESE:
+            game.cheeses[rank].state = data[i]
+            i += 1
+        elif kind == DEAD:
+            players[rank].alive = False
+        else:
+            event = EVENTS[data[i]]
+            i += 1
+            subject = (players + game.cheeses)[rank - 1] if rank else None
+            game.events.append((event, subject))
+            if event == 'exit':
+                game.outcome = 'exit'
+            if event == 'wolf-kill-player':
+                game.outcome = 'killed'
+            if event == 'game-over':
+                game.end_game = True
+    return i
+
+class Link:
+    """Messages over a TCP socket polled without blocking, with bandwidth
+    and round trip counters."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # the deltas are small and urgent
+        self.inbox = bytearray()
+        self.outbox = bytearray()
+        self.sent = 0 # bytes so far
+        self.received = 0
+        self.samples = deque() # (time, sent, received) of the last second
+        self.rtt = None # last round trip, in millisecond
+        self.pinged = 0 # time of the last ping
+
+    @property
+    def open(self):
+        return self.sock is not None
+
+    def send(self, kind, payload=b''):
+        self.outbox += kind
+        varint(self.outbox, len(payload))
+        self.outbox += payload
+
+    def flush(self):
+        """Send what the socket takes now, keep the rest for the next frame."""
+        now = clock()
+        if self.open and now - self.pinged >= NET_PING / 1000.0:
+            self.pinged = now
+            self.send(b'P', PING.pack(int(now * 1000) & 0xFFFFFFFF))
+        while self.open and self.outbox:
+            try:
+                n = self.sock.send(bytes(self.outbox))
+            except socket.error as error:
+                if error.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                self.close()
+                break
+            del self.outbox[:n]
+            self.sent += n
+        self.count(now)
+
+    def receive(self):
+        """Messages (kind, payload) come since the last call, the pings
+        answered already."""
+        while self.open:
+            try:
+                data = self.sock.recv(4096)
+            except socket.error as error:
+                if error.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    self.close()
+                break
+            if not data:
+                self.close()
+                break
+            self.inbox += data
+            self.received += len(data)
+        messages = []
+        i = 0
+        while len(self.inbox) - i >= 2:
+            kind = bytes(self.inbox[i:i + 1])
+            try:
+                size, start = read_varint(self.inbox, i + 1)
+            except IndexError:
+                break # the length is not all there yet
+            if len(self.inbox) < start + size:
+                break
+            payload = bytes(self.inbox[start:start + size])
+            i = start + size
+            if kind == b'P':
+                self.send(b'Q', payload)
+            elif kind == b'Q':
+                self.rtt = (int(clock() * 1000) - PING.unpack(payload)[0]) & 0xFFFFFFFF
+            else:
+                messages.append((kind, payload))
+        del self.inbox[:i]
+        return messages
+
+    def count(self, now):
+        self.samples.append((now, self.sent, self.received))
+        while now - self.samples[0][0] > 1.0:
+            self.samples.popleft()
+
+    def rates(self):
+        """Bytes sent and received by second."""
+        if len(self.samples) < 2:
+            return 0, 0
+        (start, sent, received), (end, sent2, received2) = self.samples[0], self.samples[-1]
+        elapsed = max(end - start, 0.001)
+        return (sent2 - sent) / elapsed, (received2 - received) / elapsed
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+class Host:
+    """Game side: waits for the client, sends it the changes of the game,
+    and steers the first wolf as it says."""
+
+    def __init__(self, port=NET_PORT, address=''):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((address, port))
+        self.server.listen(1)
+        self.server.setblocking(False)
+        self.port = self.server.getsockname()[1]
+        self.link = None
+        self.game = None
+        self.held = None # direction held by the client
+        self.full = 0 # size of the last whole state sent
+
+    def start(self, game):
+        """Play game from now on, a new level."""
+        self.game = game
+        if self.link:
+            game.steering[game.wolf] = self.held
+            self.resync()
+
+    def resync(self):
+        # the whole state, the next deltas come from there
+        data = savegame.save(self.game)
+        self.full = len(data)
+        self.link.send(b'F', data)
+        self.last = snapshot(self.game)
+        self.deltas = bytearray()
+        self.ticks = self.game.clock.ticks
+        self.events = (self.game.events, len(self.game.events)) # sent so far
+
+    def poll(self):
+        """Accept the client, (re)connecting, and read its direction."""
+        try:
+            sock, address = self.server.accept()
+        except socket.error:
+            sock = None
+        if sock:
+            # a new connection replaces the previous one
+            self.drop()
+            self.link = Link(sock)
+            if self.game:
+                self.start(self.game)
+        if not self.link:
+            return
+        for kind, payload in self.link.receive():
+            if kind == b'I' and payload:
+                rank = bytearray(payload)[0]
+                self.held = DIRECTIONS[rank] if rank < NONE else None
+                if self.game:
+                    self.game.steering[self.game.wolf] = self.held
+        if not self.link.open:
+            self.drop()
+
+    def drop(self):
+        # the wolf goes back to the game
+        if self.link:
+            self.link.close()
+            self.link = None
+        self.held = None
+        if self.game:
+            self.game.steering.pop(self.game.wolf, None)
+
+    def tick(self):
+        """A tick of the game was played: keep its changes for the client."""
+        if not self.link or not self.game:
+            return
+        game = self.game
+        events, sent = self.events
+        if events is not game.events:
+            sent = 0 # the maze dispatched them, a new list goes on
+        data, n = delta(game, self.last, game.events[sent:])
+        self.events = (game.events, len(game.events))
+        if n:
+            varint(self.deltas, game.clock.ticks - self.ticks)
+            varint(self.deltas, n)
+            self.deltas += data
+            self.ticks = game.clock.ticks
+            self.last = snapshot(game)
+
+    def flush(self):
+        """End of the frame: send the deltas of its ticks."""
+        if not self.link:
+            return
+        if self.deltas:
+            self.link.send(b'D', bytes(self.deltas))
+            self.deltas = bytearray()
+        self.link.flush()
+        if not self.link.open:
+            self.drop()
+
+    def close(self):
+        self.drop()
+        self.server.close()
+
+class Client:
+    """Display side: connects to the host, keeps a copy of its game up to
+    date and sends the direction held."""
+
+    def __init__(self, address, port=NET_PORT):
+        self.address = (address, port)
+        self.link = None
+        self.game = None
+        self.held = None
+        self.tried = None # time of the last connection attempt
+        self.connecting = None # socket of the attempt going on
+        self.ticks = 0 # tick of the host game
+
+    def connect(self):
+        """Go on connecting to the host without waiting: the socket is
+        connected once writable, on a later poll."""
+        sock = self.connecting
+        if sock:
+            readable, writable, failed = select.select([], [sock], [sock], 0)
+            if not writable and not failed:
+                return
+            self.connecting = None
+            if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR):
+                sock.close() # tried again after NET_RETRY
+                return
+            self.link = Link(sock)
+            self.held = None
+            return
+        now = clock()
+        if self.tried is not None and now - self.tried < NET_RETRY / 1000.0:
+            return
+        self.tried = now
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        error = sock.connect_ex(self.address)
+        if error not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+            sock.close()
+            return
+        self.connecting = sock
+
+    def poll(self):
+        """Read the host messages: return the game of a whole state, to be
+        displayed from now on, None otherwise."""
+        if not self.link:
+            self.connect()
+        if not self.link:
+            return None
+        new = None
+        for kind, payload in self.link.receive():
+            if kind == b'F':
+                self.game = new = savegame.load(payload)
+                self.ticks = new.clock.ticks
+            elif kind == b'D' and self.game:
+                data, i = bytearray(payload), 0
+                while i < len(data):
+                    ticks, i = read_varint(data, i)
+                    n, i = read_varint(data, i)
+                    # the clock of the client runs on its own between the
+                    # deltas, and never behind the host
+                    self.ticks += ticks
+                    scheduler = self.game.clock
+                    scheduler.ticks = max(scheduler.ticks, self.ticks)
+                    i = patch(self.game, data, i, n)
+        if not self.link.open:
+            self.link = None
+        return new
+
+    def steer(self, direction):
+        """The player holds direction, None for none."""
+        if self.link and direction != self.held:
+            self.held = direction
+            self.link.send(b'I', bytearray([DIRECTIONS.index(direction) if direction else NONE]))
+
+    def flush(self):
+        if self.link:
+            self.link.flush()
+            if not self.link.open:
+                self.link = None
+
+    def close(self):
+        if self.connecting:
+            self.connecting.close()
+            self.connecting = None
+        if self.link:
+            self.link.close()
+            self.link = None
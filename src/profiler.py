@@ -0,0 +1,187 @@
+import csv
+import time
+import threading
+from collections import deque
+import pygame
+from gconstants import *
+import images
+import drawing
+
+# Frame profiler of the main loop.
+#
+# The main loop marks the end of each of its phases with lap(); the engine
+# calls of the path finding (next_move) and the collision checks (enter,
+# collisions) are timed apart, out of the ticks phase. The blits and fills of
+# the frame, and the surfaces made by it, are counted on the drawing
+# primitives of the game, see drawing.py, while the overlay is shown or the
+# frames written only. A scaled image counts as one surface.
+#
+# The overlay shows the frame rate, the worst frame, the mean time of each
+# phase and the latency of the player input over the last PROFILE_WINDOW
+# frames, and the bandwidth and round trip of the network play. With
+# PROFILE_CSV, every frame is also written to that file for offline analysis.
+
+__metaclass__ = type
+
+clock = getattr(time, 'perf_counter', time.time)
+
+# phases of a frame, in the main loop order
+PHASES = ('events', 'generation', 'ai', 'collisions', 'ticks', 'dispatch',
+          'animation', 'hud', 'flip', 'wait')
+COUNTERS = ('blits', 'fills', 'surfaces')
+
+# drawing primitives of the game, and the counter of their calls
+DRAWING = ((drawing, 'blit', 'blits'), (drawing, 'fill', 'fills'), (drawing, 'surface', 'surfaces'),
+           (images, 'scaled', 'surfaces'))
+
+counts = dict((name, 0) for name in COUNTERS)
+
+class Profiler:
+    """Time of each phase and drawing counts of the frames."""
+
+    def __init__(self, path=None, window=PROFILE_WINDOW):
+        self.budget = 1000.0 / FPS # in millisecond
+        self.records = deque(maxlen=window)
+        self.latencies = deque(maxlen=window) # from a key press to the display of its move
+        self.latency = None # of the frame
+        self.times = dict((phase, 0.0) for phase in PHASES)
+        self.nested = 0.0 # time of the timed calls since the last lap
+        self.start = self.last = clock()
+        self.frames = 0
+        self.net = None # netplay.Host or Client, its link counted
+        self.font = None
+        self.text = None # overlay image and the frame it was made
+        self.thread = threading.current_thread() # of the main loop
+        self.helpers = [] # (owner, name, helper) of the drawing primitives counted
+        self.file = None
+        if path:
+            self.file = open(path, 'w')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(('frame', 'state', 'ms') + PHASES + COUNTERS + ('input',))
+        self.visible = False
+
+    @property
+    def visible(self):
+        return self.shown
+
+    @visible.setter
+    def visible(self, visible):
+        self.shown = visible
+        self.count(visible or self.file is not None)
+
+    def count(self, on):
+        """Count the calls of the drawing primitives of the game, or stop."""
+        if on == bool(self.helpers):
+            return
+        if on:
+            self.helpers = [(owner, name, vars(owner)[name]) for owner, name, counter in DRAWING]
+            for owner, name, counter in DRAWING:
+                setattr(owner, name, self.counted(counter, getattr(owner, name)))
+        else:
+            for owner, name, helper in self.helpers:
+                setattr(owner, name, helper)
+            self.helpers = []
+
+    def counted(self, name, function):
+        def call(*args, **kwargs):
+            # the workers build the next level meanwhile, out of the frame
+            if threading.current_thread() is self.thread:
+                counts[name] += 1
+            return function(*args, **kwargs)
+        return call
+
+    def timed(self, phase, function):
+        def call(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                self.times[phase] += elapsed
+                self.nested += elapsed
+        return call
+
+    def attach(self, game):
+        """Time the path finding and the collision checks of game."""
+        game.next_move = self.timed('ai', game.next_move)
+        game.enter = self.timed('collisions', game.enter)
+        game.collisions = self.timed('collisions', game.collisions)
+
+    def lap(self, phase):
+        """End phase of the frame."""
+        now = clock()
+        self.times[phase] += now - self.last - self.nested
+        self.nested = 0.0
+        self.last = now
+
+    def input(self, latency):
+        """The frame showed the move of a key pressed latency ms before."""
+        self.latency = latency
+        self.latencies.append(latency)
+
+    def frame(self, state):
+        """End the frame, played in the main loop state, and start the next one."""
+        now = clock()
+        record = [self.frames, state, (now - self.start) * 1000]
+        record += [self.times[phase] * 1000 for phase in PHASES]
+        record += [counts[name] for name in COUNTERS]
+        self.records.append(record)
+        if self.file:
+            self.writer.writerow([round(value, 3) if isinstance(value, float) else value for value in record] +
+                                 [self.latency if self.latency is not None else ''])
+        self.latency = None
+        for phase in PHASES:
+            self.times[phase] = 0.0
+        for name in COUNTERS:
+            counts[name] = 0
+        self.frames += 1
+        self.start = self.last = now
+        self.nested = 0.0
+
+    def summary(self):
+        """Lines of the overlay: rates, then the mean time of the phases."""
+        records = list(self.records)
+        n = float(len(records))
+        total = sum(record[2] for record in records)
+        worst = max(record[2] for record in records)
+        lines = ["{:.1f} fps  worst {:.0f} ms  budget {:.0f} ms".format(n * 1000 / total, worst, self.budget)]
+        means = [sum(record[3 + i + len(PHASES)] for record in records) / n for i in range(len(COUNTERS))]
+        counters = ["{} {:.0f}".format(name, mean) for name, mean in zip(COUNTERS, means)]
+        if self.latencies:
+            counters += ["input {:.0f} ms".format(sum(self.latencies) / float(len(self.latencies)))]
+        lines += ["  ".join(counters)]
+        phases = ["{} {:.1f}".format(phase, sum(record[3 + i] for record in records) / n)
+                  for i, phase in enumerate(PHASES) if phase != 'wait']
+        lines += ["  ".join(phases[:5]), "  ".join(phases[5:])]
+        link = self.net and self.net.link
+        if link:
+            up, down = link.rates()
+            rtt = "{} ms".format(link.rtt) if link.rtt is not None else "-"
+            lines += ["net up {:.0f} B/s  down {:.0f} B/s  rtt {}".format(up, down, rtt)]
+        return lines
+
+    def draw(self, screen):
+        """Draw the overlay at the screen top left corner, return its rect."""
+        if not self.records or not pygame.font:
+            return None
+        # the text is made again twice a second
+        if not self.text or self.frames - self.text[1] >= FPS // 2:
+            if not self.font:
+                pygame.font.init()
+                self.font = pygame.font.Font(None, 12)
+            lines = [self.font.render(line, True, (255, 255, 255)) for line in self.summary()]
+            image = drawing.surface((max(line.get_width() for line in lines) + 4,
+                                     sum(line.get_height() for line in lines) + 4))
+            image.set_alpha(176)
+            y = 2
+            for line in lines:
+                drawing.blit(image, line, (2, y))
+                y += line.get_height()
+            self.text = (image, self.frames)
+        return drawing.blit(screen, self.text[0], (0, 0))
+
+    def close(self):
+        self.count(False)
+        if self.file:
+            self.file.close()
+            self.file = None
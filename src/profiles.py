@@ -0,0 +1,47 @@
+import os
+
+# Display profiles: the sizes in pixel of the cells, walls, sprites and
+# screen of each kind of display, its frame rate, and the delay in
+# millisecond before a key held repeats the moves of the player.
+#
+# main.py picks the profile of the display before any module reads the
+# constants: the biggest screen fitting the display, so the GCW Zero one on
+# the handheld. TRAP_PROFILE=<name> forces a profile. The tools without
+# display (batch, replay, bench) keep the GCW Zero sizes.
+
+PROFILES = {
+    # GCW ZERO OPTIMAL SIZE SCREEN
+    'gcw0': {'cell': (20, 20), 'wall': 3, 'sprite': 10, 'screen': (320, 240), 'margin': 80,
+             'fps': 25, 'repeat': 250},
+    # small desktop screen or window
+    'vga': {'cell': (40, 40), 'wall': 5, 'sprite': 20, 'screen': (640, 480), 'margin': 160,
+            'fps': 60, 'repeat': 400},
+    # DESKTOP SIZE SCREEN
+    'desktop': {'cell': (80, 80), 'wall': 10, 'sprite': 40, 'screen': (1280, 960), 'margin': 320,
+                'fps': 60, 'repeat': 400},
+}
+DEFAULT = 'gcw0'
+
+def detect():
+    """Name of the biggest profile fitting the display, TRAP_PROFILE when set."""
+    name = os.environ.get('TRAP_PROFILE')
+    if name:
+        return name
+    import pygame
+    pygame.display.init()
+    info = pygame.display.Info()
+    fitting = [(profile['screen'], name) for name, profile in PROFILES.items()
+               if profile['screen'][0] <= info.current_w and profile['screen'][1] <= info.current_h]
+    return max(fitting)[1] if fitting else DEFAULT
+
+def select():
+    """Use the profile of the display from now on: call it before importing
+    the modules of the game."""
+    os.environ['TRAP_PROFILE'] = detect()
+
+def current():
+    """Name and sizes of the profile in use."""
+    name = os.environ.get('TRAP_PROFILE', DEFAULT)
+    if name not in PROFILES:
+        raise ValueError('unknown display profile {}, choose one of {}'.format(name, ', '.join(sorted(PROFILES))))
+    return name, PROFILES[name]
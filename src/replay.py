@@ -0,0 +1,60 @@
+#! /usr/bin/env python
+__author__ = 'Joris Quenee'
+
+# Replay the input log of a game headlessly, as fast as possible.
+#
+# Set RECORD_DIR in gconstants.py to record the games, then:
+#
+#   ./src/replay.py trap-1234.log
+#
+# The digest of the final state must be the same on every build: a change
+# means the game logic does not play the same game any more.
+
+import argparse
+import hashlib
+import time
+import engine
+from scheduler import InputLog, TIMERS
+
+def replay(log):
+    """Play the game of log and return it."""
+    w, h, ix, iy, seed, periods, (mice, cheeses, wolves, hunting, seeking), generator = log.setup
+    game = engine.Game(w, h, ix, iy, seed, dict(zip(TIMERS, periods)))
+    game.hunting = hunting
+    game.seeking = seeking
+    game.generator = generator
+    game.generate(mice, cheeses, wolves)
+    for held, pressed in log.inputs():
+        game.tick(held, pressed)
+        if game.end_game:
+            break
+    return game
+
+def digest(game):
+    """Short fingerprint of the game state."""
+    state = [game.outcome, game.clock.ticks, game.player.x, game.player.y, game.wolf.x, game.wolf.y]
+    for wolf in game.wolves[1:]:
+        state += [wolf.x, wolf.y]
+    for mouse in game.mice:
+        state += [mouse.x, mouse.y, mouse.alive]
+    for cheese in game.cheeses:
+        state += [cheese.state]
+    return hashlib.sha1(repr(state).encode('ascii')).hexdigest()[:12]
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay input logs of Trap games.')
+    parser.add_argument('logs', nargs='+')
+    parser.add_argument('--repeat', type=int, default=1, help='replay each log again to benchmark')
+    args = parser.parse_args()
+
+    for path in args.logs:
+        log = InputLog.load(path)
+        start = time.time()
+        for i in range(args.repeat):
+            game = replay(log)
+        elapsed = (time.time() - start) / args.repeat
+        print("{}: {} after {:.1f} s, {} ticks replayed in {:.1f} ms, digest {}".format(
+            path, game.outcome or 'quit', game.time / 1000.0, game.clock.ticks, elapsed * 1000, digest(game)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+from array import array
+from collections import deque
+from heapq import heappush, heappop
+
+# Route lookup over a perfect maze.
+#
+# Every generator of generators.py carves a spanning tree of the grid, so the
+# route between two cells is unique: climb from both cells up to their lowest
+# common ancestor. The tree is rooted once after generation, then every query
+# costs O(path length) without any search.
+
+__metaclass__ = type
+
+# offset to reach the neighbour behind each wall
+moves = {'N': (0, -1), 'S': (0, 1), 'E': (1, 0), 'W': (-1, 0)}
+opposite = {'N': 'S', 'S': 'N', 'E': 'W', 'W': 'E'}
+# bit of each wall in the grid cells, set while the wall stands
+wall_bits = {'N': 1, 'S': 2, 'E': 4, 'W': 8}
+bit_walls = dict((bit, wall) for wall, bit in wall_bits.items())
+ALL_WALLS = 15
+
+class RoutingTable:
+    """Parent, direction and depth of every cell in the maze spanning tree,
+    in flat arrays indexed like the grid cells."""
+
+    def __init__(self, maze):
+        self.w, self.h = maze.w, maze.h
+        n = self.w * self.h
+        self.parent = array('i', [-1]) * n
+        self.direction = bytearray(n) # wall bit of the move from the parent to the cell
+        self.depth = array('i', [0]) * n
+
+        # index offset and wall bit of each move
+        steps = [(moves[o][0] * self.h + moves[o][1], wall_bits[o]) for o in 'NSEW']
+        walls = maze.walls
+        # breadth-first walk of the tree from the generation start point
+        root = self.index(maze.ix, maze.iy)
+        self.parent[root] = root
+        queue = deque([root])
+        while queue:
+            i = queue.popleft()
+            for di, bit in steps:
+                if walls[i] & bit:
+                    continue
+                j = i + di
+                if self.parent[j] == -1:
+                    self.parent[j] = i
+                    self.direction[j] = bit
+                    self.depth[j] = self.depth[i] + 1
+                    queue.append(j)
+
+    def index(self, x, y):
+        return x * self.h + y
+
+    def path(self, source, destination):
+        """Return the moves from source to destination cell.
+
+        The moves are stacked like Wolf.path_stack: the first move to play is
+        the last item of the list.
+
+        """
+        a = self.index(source.x, source.y)
+        b = self.index(destination.x, destination.y)
+        up, down = [], [] # moves from the source side / toward the destination
+        while a != b:
+            if self.depth[a] >= self.depth[b]:
+                up.append(opposite[bit_walls[self.direction[a]]])
+                a = self.parent[a]
+            else:
+                down.append(bit_walls[self.direction[b]])
+                b = self.parent[b]
+        up.reverse()
+        return down + up
+
+class DistanceField:
+    """Distance of every cell to the nearest source cell, and the move toward it.
+
+    The field is shared by all the actors heading to the sources: once it is
+    computed, each of them reads its next move in O(1), however many they are.
+
+    A cell as far from two sources moves toward its neighbour of lower index:
+    the field of the sources is the same whatever the order they were added
+    or removed in.
+
+    """
+
+    def __init__(self, maze):
+        self.w, self.h = maze.w, maze.h
+        self.walls = maze.walls
+        self.distance = array('i', [-1]) * (self.w * self.h)
+        self.toward = bytearray(self.w * self.h) # wall bit of the move toward the nearest source
+        self.sources = ()
+        # index offset, wall bit and wall bit back of each move
+        self.steps = [(moves[o][0] * self.h + moves[o][1], wall_bits[o], wall_bits[opposite[o]]) for o in 'NSEW']
+        self.offsets = dict((wall_bits[o], moves[o][0] * self.h + moves[o][1]) for o in 'NSEW')
+
+    def update(self, sources):
+        """Compute the field of the source cell indexes, with a breadth-first
+        walk from all of them at once."""
+        walls, steps, offsets = self.walls, self.steps, self.offsets
+        distance = self.distance = array('i', [-1]) * (self.w * self.h)
+        toward = self.toward = bytearray(self.w * self.h)
+        for i in sources:
+            distance[i] = 0
+        queue = deque(sources)
+        while queue:
+            i = queue.popleft()
+            d = distance[i] + 1
+            for di, bit, back in steps:
+                if walls[i] & bit:
+                    continue
+                j = i + di
+                if distance[j] == -1:
+                    distance[j] = d
+                    toward[j] = back
+                    queue.append(j)
+                elif distance[j] == d and i < j + offsets[toward[j]]:
+                    toward[j] = back
+        self.sources = tuple(sources)
+
+    def remove(self, source):
+        """Drop the source cell index: only the cells it was the nearest
+        source of are walked again, from the cells around them."""
+        walls, steps, distance, toward = self.walls, self.steps, self.distance, self.toward
+        # the cells moving toward source, down to the source itself
+        distance[source] = -1
+        toward[source] = 0
+        region = [source]
+        for i in region:
+            for di, bit, back in steps:
+                if walls[i] & bit:
+                    continue
+                j = i + di
+                if distance[j] > 0 and toward[j] == back:
+                    distance[j] = -1
+                    toward[j] = 0
+                    region.append(j)
+        # grow the other sources into the region, by distance then index
+        heap = []
+        for i in region:
+            for di, bit, back in steps:
+                if not walls[i] & bit and distance[i + di] != -1:
+                    heappush(heap, (distance[i + di], i + di))
+        while heap:
+            d, i = heappop(heap)
+            for di, bit, back in steps:
+                if walls[i] & bit:
+                    continue
+                j = i + di
+                if distance[j] == -1:
+                    distance[j] = d + 1
+                    toward[j] = back
+                    heappush(heap, (d + 1, j))
+        self.sources = tuple(i for i in self.sources if i != source)
+
+    def move(self, x, y):
+        """Move from (x, y) toward the nearest source, None on a source."""
+        return bit_walls.get(self.toward[x * self.h + y])
+
+def distance_field(maze, sources):
+    """New distance field of the source cells, safe to compute in a worker."""
+    field = DistanceField(maze)
+    field.update(sources)
+    return field
+
+class Visibility:
+    """Cells seen from each cell of the maze, looking along the straight
+    corridors, computed once.
+
+    A cell sees the run of cells joined to it without a wall in its row, and
+    the one in its column. The bounds of both runs are kept by cell, 8 bytes
+    whatever the maze size, and make the bitset of the cell indexes seen on
+    demand.
+
+    """
+
+    def __init__(self, maze):
+        self.w, self.h = w, h = maze.w, maze.h
+        walls = maze.walls
+        # west, east, north and south bound of the runs of each cell
+        self.bounds = bounds = array('H', [0]) * (4 * w * h)
+        for y in range(h):
+            west = 0
+            for x in range(w):
+                if walls[x * h + y] & wall_bits['E'] or x == w - 1:
+                    for k in range(west, x + 1):
+                        bounds[4 * (k * h + y)] = west
+                        bounds[4 * (k * h + y) + 1] = x
+                    west = x + 1
+        for x in range(w):
+            north = 0
+            for y in range(h):
+                if walls[x * h + y] & wall_bits['S'] or y == h - 1:
+                    for k in range(north, y + 1):
+                        bounds[4 * (x * h + k) + 2] = north
+                        bounds[4 * (x * h + k) + 3] = y
+                    north = y + 1
+
+    def at(self, x, y):
+        """Bitset of the cells seen from (x, y)."""
+        h = self.h
+        i = 4 * (x * h + y)
+        west, east, north, south = self.bounds[i:i + 4]
+        # the cells of a column run have consecutive indexes, the ones of a
+        # row run are h apart
+        bits = ((1 << (south + 1 - north)) - 1) << (x * h + north)
+        for k in range(west, east + 1):
+            bits |= 1 << (k * h + y)
+        return bits
+
+def cells(bits, h):
+    """Cells (x, y) of a bitset of cell indexes."""
+    while bits:
+        low = bits & -bits
+        bits ^= low
+        yield divmod(low.bit_length() - 1, h)
@@ -0,0 +1,188 @@
+import struct
+from routing import RoutingTable, DistanceField, distance_field, moves, wall_bits
+from scheduler import Scheduler, TIMERS
+from generators import NAMES
+from engine import Game, Actor, Item, Occupancy
+
+# Save and resume a game in a few hundred bytes.
+#
+# A save holds the whole state of a finite game: the passages of the maze,
+# the actors and the cheeses, the random generator and the timers. Loading
+# it neither carves the maze again nor replays the game; the routing table
+# is indexed again, in one walk of the maze. The game goes on exactly as if
+# it had not been saved, tick for tick.
+#
+# The layout, big endian:
+#   header      magic, version, w, h, ix, iy, seed, the timer periods,
+#               generator rank, modes (hunting, seeking), outcome, random
+#               state, ticks, lag
+#               and the tick each timer fires next
+#   passages    2 bits by cell, the east and south walls knocked down
+#   exit        x, y
+#   actors      the player, the wolves, then the mice: x, y, alive and the
+#               cell ending the route it follows
+#   cheeses     x, y, state, freeze
+#   occupants   the things in the order they entered their cell, as ranks
+#               in the actors then the cheeses
+#   feeding     the ranks of the cheeses being eaten
+#   hunting     the cell of the distance field and the cell and tick of the
+#               next one
+
+HEADER = struct.Struct('>4sBHHHHI' + 'I' * len(TIMERS) + 'BBBQIH' + 'I' * len(TIMERS))
+COUNTS = struct.Struct('>HHH') # wolves, mice, cheeses
+EXIT = struct.Struct('>HH')
+ACTOR = struct.Struct('>HHBHH')
+CHEESE = struct.Struct('>HHBH')
+HUNTING = struct.Struct('>III')
+# version 2 adds the seeking mice, bit 1 of the modes
+# version 3 stores the counts and the ranks in 2 bytes, for the big levels
+VERSION = 3
+SMALL_COUNTS = struct.Struct('>BBB') # before version 3
+NONE = 0xFFFF
+NO_CELL = 0xFFFFFFFF
+OUTCOMES = (None, 'exit', 'killed')
+
+def destination(actor):
+    """Cell ending the route of actor: the route is the only path to it."""
+    if not actor.path_stack:
+        return NONE, NONE
+    x, y = actor.x, actor.y
+    for direction in reversed(actor.path_stack):
+        dx, dy = moves[direction]
+        x, y = x + dx, y + dy
+    return x, y
+
+def ranks(values):
+    # count then values
+    return struct.pack('>{}H'.format(len(values) + 1), len(values), *values)
+
+def read_ranks(raw, i, size):
+    """Ranks stored at raw[i] in size bytes each, and the index after them."""
+    code = '>{}' + ('H' if size == 2 else 'B')
+    count = struct.unpack_from(code.format(1), raw, i)[0]
+    values = struct.unpack_from(code.format(count), raw, i + size)
+    return values, i + size * (count + 1)
+
+def save(game):
+    """State of a game in a finite maze, as bytes."""
+    grid, clock = game.grid, game.clock
+    data = bytearray(HEADER.pack(b'TRSV', VERSION, grid.w, grid.h, grid.ix, grid.iy, game.seed & 0xFFFFFFFF,
+                                 *([game.periods[name] for name in TIMERS] +
+                                   [NAMES.index(game.generator), game.hunting | game.seeking << 1,
+                                    OUTCOMES.index(game.outcome), game.rng.getstate(), clock.ticks, clock.lag] +
+                                   [clock.due[name] for name in TIMERS])))
+    data += COUNTS.pack(len(game.wolves), len(game.mice), len(game.cheeses))
+    # the north and west walls are the south and east ones of the neighbours
+    passages = bytearray((grid.w * grid.h + 3) // 4)
+    for i, bits in enumerate(grid.walls):
+        passage = (0 if bits & wall_bits['E'] else 1) | (0 if bits & wall_bits['S'] else 2)
+        passages[i >> 2] |= passage << ((i & 3) * 2)
+    data += passages
+    data += EXIT.pack(game.exit.x, game.exit.y)
+    actors = [game.player] + game.wolves + game.mice
+    for actor in actors:
+        data += ACTOR.pack(actor.x, actor.y, actor.alive, *destination(actor))
+    for cheese in game.cheeses:
+        data += CHEESE.pack(cheese.x, cheese.y, cheese.state, cheese.freeze)
+    things = actors + game.cheeses
+    rank = dict((id(thing), i) for i, thing in enumerate(things))
+    occupants = [rank[id(thing)] for cell in game.occupants.cells.values() for thing in cell]
+    data += ranks(occupants)
+    data += ranks([rank[id(cheese)] for cheese in game.feeding])
+    field = game.field.sources[0] if game.field and game.field.sources else NO_CELL
+    chasing = game.chasing[:2] if game.chasing else (NO_CELL, NO_CELL)
+    data += HUNTING.pack(field, *chasing)
+    return bytes(data)
+
+def load(data):
+    """Game of a save, ready to play its next tick."""
+    try:
+        return restore(data)
+    except (struct.error, IndexError):
+        raise ValueError('truncated Trap save')
+
+def restore(data):
+    raw, data = bytes(data), bytearray(data)
+    fields = HEADER.unpack_from(raw)
+    magic, version, w, h, ix, iy, seed = fields[:7]
+    if magic != b'TRSV' or version > VERSION:
+        raise ValueError('not a Trap save')
+    n = len(TIMERS)
+    periods = dict(zip(TIMERS, fields[7:7 + n]))
+    generator, modes, outcome, state, ticks, lag = fields[7 + n:13 + n]
+    game = Game(w, h, ix, iy, seed, periods)
+    game.generator = NAMES[generator]
+    game.hunting = bool(modes & 1)
+    game.seeking = bool(modes & 2)
+    game.outcome = OUTCOMES[outcome]
+    game.end_game = game.outcome is not None
+    game.rng.setstate(state)
+    game.clock = Scheduler(game.periods)
+    game.clock.ticks, game.clock.lag = ticks, lag
+    game.clock.due = dict(zip(TIMERS, fields[13 + n:]))
+    i = HEADER.size
+    counts = COUNTS if version >= 3 else SMALL_COUNTS
+    wolves, mice, cheeses = counts.unpack_from(raw, i)
+    i += counts.size
+
+    grid = game.grid
+    for cell in range(w * h):
+        passage = (data[i + (cell >> 2)] >> ((cell & 3) * 2)) & 3
+        x, y = divmod(cell, h)
+        if passage & 1:
+            grid.knock_down_wall(x, y, 'E')
+        if passage & 2:
+            grid.knock_down_wall(x, y, 'S')
+    i += (w * h + 3) // 4
+    game.routes = RoutingTable(grid)
+    if game.hunting:
+        game.field = DistanceField(grid)
+    if game.seeking:
+        game.scent = DistanceField(grid)
+    game.exit = grid.cell_at(*EXIT.unpack_from(raw, i))
+    i += EXIT.size
+
+    actors = []
+    for kind in ['player'] + ['wolf'] * wolves + ['mouse'] * mice:
+        x, y, alive, dx, dy = ACTOR.unpack_from(raw, i)
+        i += ACTOR.size
+        actor = Actor(kind, x, y)
+        actor.alive = bool(alive)
+        if dx != NONE:
+            actor.path_stack = game.routes.path(actor, grid.cell_at(dx, dy))
+        actors.append(actor)
+    game.player, game.wolves, game.mice = actors[0], actors[1:1 + wolves], actors[1 + wolves:]
+    game.wolf = game.wolves[0]
+    game.cheeses = []
+    for k in range(cheeses):
+        x, y, state, freeze = CHEESE.unpack_from(raw, i)
+        i += CHEESE.size
+        cheese = Item(x, y)
+        cheese.state, cheese.freeze = state, freeze
+        game.cheeses.append(cheese)
+    if game.seeking:
+        game.smell()
+
+    things = actors + game.cheeses
+    game.occupants = Occupancy(h)
+    size = 2 if version >= 3 else 1
+    occupants, i = read_ranks(raw, i, size)
+    for rank in occupants:
+        thing = things[rank]
+        game.occupants.add(thing, thing.x, thing.y)
+    feeding, i = read_ranks(raw, i, size)
+    game.feeding = [things[rank] for rank in feeding]
+    field, source, due = HUNTING.unpack_from(raw, i)
+    if field != NO_CELL:
+        game.field.update([field])
+    if source != NO_CELL:
+        game.chasing = (source, due, game.workers.submit(distance_field, grid, [source]))
+    return game
+
+def write(game, path):
+    with open(path, 'wb') as f:
+        f.write(save(game))
+
+def read(path):
+    with open(path, 'rb') as f:
+        return load(f.read())
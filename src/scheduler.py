@@ -0,0 +1,218 @@
+import random
+import struct
+from gconstants import *
+from generators import NAMES
+
+# Fixed timestep clock, random generator and input log of a game.
+#
+# The game advances by ticks of TICK milliseconds whatever the frame rate:
+# the actor timers are counted in ticks and every random draw comes from the
+# game own generator, so a game is fully defined by its seed and the player
+# input at each tick. The input log stores that much, and replays the game
+# headlessly as fast as the CPU goes.
+
+__metaclass__ = type
+
+MASK = 0xFFFFFFFFFFFFFFFF
+
+class Rng(random.Random):
+    """xorshift64* generator: small state, the same draws on every platform."""
+
+    def __init__(self, seed=None):
+        super(Rng, self).__init__(seed) # Python 2.x adaptation
+
+    def seed(self, a=None, version=2):
+        if a is None:
+            a = random.getrandbits(32)
+        self.initial_seed = a
+        # splitmix64 spreads the seed bits, the state must not be 0
+        z = (a + 0x9E3779B97F4A7C15) & MASK
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+        self.state = (z ^ (z >> 31)) or 1
+        self.gauss_next = None
+
+    def next(self):
+        x = self.state
+        x ^= x >> 12
+        x ^= (x << 25) & MASK
+        x ^= x >> 27
+        self.state = x
+        return (x * 0x2545F4914F6CDD1D) & MASK
+
+    def random(self):
+        return (self.next() >> 11) * (1.0 / (1 << 53))
+
+    def getrandbits(self, k):
+        bits, n = 0, 0
+        while n < k:
+            bits = (bits << 64) | self.next()
+            n += 64
+        return bits >> (n - k)
+
+    def getstate(self):
+        return self.state
+
+    def setstate(self, state):
+        self.state = state
+
+# actor timers, fired in this order when they expire on the same tick
+TIMERS = ('player', 'wolf', 'mouse', 'teleportation')
+
+class Scheduler:
+    """Fixed timestep clock owning the actor timers of a game."""
+
+    def __init__(self, periods, tick=TICK):
+        self.tick = tick
+        self.ticks = 0 # ticks played so far
+        self.lag = 0 # frame time not played yet, in millisecond
+        # timer periods in ticks, and the tick each timer fires next
+        self.periods = dict((name, max(1, periods[name] // tick)) for name in TIMERS)
+        self.due = dict(self.periods)
+
+    @property
+    def time(self):
+        return self.ticks * self.tick
+
+    def ticks_for(self, dt):
+        """Number of ticks to play for a frame lasting dt milliseconds.
+
+        A late frame plays at most MAX_TICKS ticks: the game slows down
+        instead of moving its actors by bursts.
+
+        """
+        self.lag += dt
+        n = self.lag // self.tick
+        if n > MAX_TICKS:
+            n = MAX_TICKS
+            self.lag = 0
+        else:
+            self.lag -= n * self.tick
+        return n
+
+    def wait(self):
+        """Milliseconds before the tick the next timer fires on."""
+        return max(0, (min(self.due.values()) - self.ticks) * self.tick - self.lag)
+
+    def advance(self):
+        """Play one tick and return the timers firing on it."""
+        self.ticks += 1
+        fired = []
+        for name in TIMERS:
+            if self.due[name] <= self.ticks:
+                self.due[name] += self.periods[name]
+                fired.append(name)
+        return fired
+
+# bit of each direction in the input log, held then pressed
+DIRECTIONS = 'WENS'
+HEADER = struct.Struct('>4sBHHHHIIIIII')
+# version 2 adds the actors of the level: mice, cheeses, wolves and hunting
+ACTORS = struct.Struct('>HHHB')
+# version 3 adds the rank of the maze generator in generators.NAMES
+LEVEL = struct.Struct('>B')
+# version 4 adds the seeking mice, bit 1 of the hunting byte
+VERSION = 4
+
+def input_bits(held, pressed):
+    bits = 0
+    for i, direction in enumerate(DIRECTIONS):
+        if direction in held:
+            bits |= 1 << i
+        if direction in pressed:
+            bits |= 1 << (i + 4)
+    return bits
+
+class InputLog:
+    """Player input of one game, stored as the ticks where it changed."""
+
+    def __init__(self, game=None):
+        self.changes = [] # (tick, input bits)
+        self.bits = 0
+        self.length = 0 # ticks played
+        if game:
+            grid = game.grid
+            self.setup = (grid.w, grid.h, grid.ix, grid.iy, game.seed,
+                          tuple(game.periods[name] for name in TIMERS),
+                          (len(game.mice), len(game.cheeses), len(game.wolves), game.hunting, game.seeking),
+                          game.generator)
+
+    def record(self, tick, held, pressed):
+        bits = input_bits(held, pressed)
+        if bits != self.bits:
+            self.changes.append((tick, bits))
+            self.bits = bits
+        self.length = tick
+
+    def inputs(self):
+        """Yield (held, pressed) directions for every tick of the game."""
+        changes = iter(self.changes)
+        change = next(changes, None)
+        bits = 0
+        for tick in range(1, self.length + 1):
+            if change and change[0] == tick:
+                bits = change[1]
+                change = next(changes, None)
+            yield ([d for i, d in enumerate(DIRECTIONS) if bits & (1 << i)],
+                   [d for i, d in enumerate(DIRECTIONS) if bits & (1 << (i + 4))])
+
+    def encode(self):
+        w, h, ix, iy, seed, periods, actors, generator = self.setup
+        data = bytearray(HEADER.pack(b'TRAP', VERSION, w, h, ix, iy, seed & 0xFFFFFFFF,
+                                     self.length, *periods))
+        mice, cheeses, wolves, hunting, seeking = actors
+        data += ACTORS.pack(mice, cheeses, wolves, hunting | seeking << 1)
+        data += LEVEL.pack(NAMES.index(generator))
+        last = 0
+        for tick, bits in self.changes:
+            # variable length tick delta, 7 bits by byte
+            delta = tick - last
+            while delta >= 0x80:
+                data.append((delta & 0x7F) | 0x80)
+                delta >>= 7
+            data.append(delta)
+            data.append(bits)
+            last = tick
+        return bytes(data)
+
+    @classmethod
+    def decode(cls, data):
+        data = bytearray(data)
+        magic, version, w, h, ix, iy, seed, length, p, wo, m, t = HEADER.unpack_from(bytes(data))
+        if magic != b'TRAP' or version > VERSION:
+            raise ValueError('not a Trap input log')
+        i, tick = HEADER.size, 0
+        if version == 1:
+            # the levels had 3 mice, 5 cheeses and a wandering wolf
+            actors = (3, 5, 1, False, False)
+        else:
+            mice, cheeses, wolves, modes = ACTORS.unpack_from(bytes(data), i)
+            actors = (mice, cheeses, wolves, bool(modes & 1), bool(modes & 2))
+            i += ACTORS.size
+        generator = 'dfs'
+        if version >= 3:
+            generator = NAMES[LEVEL.unpack_from(bytes(data), i)[0]]
+            i += LEVEL.size
+        log = cls()
+        log.setup = (w, h, ix, iy, seed, (p, wo, m, t), actors, generator)
+        log.length = length
+        while i < len(data):
+            delta, shift = 0, 0
+            while data[i] & 0x80:
+                delta |= (data[i] & 0x7F) << shift
+                shift += 7
+                i += 1
+            delta |= data[i] << shift
+            tick += delta
+            log.changes.append((tick, data[i + 1]))
+            i += 2
+        return log
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.encode())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.decode(f.read())
@@ -0,0 +1,61 @@
+import pygame
+
+# Sound bank of the game.
+#
+# Every WAV is loaded and decoded once at startup, and each category of
+# sounds plays on its own reserved mixer channel, so a sound never waits for a
+# free channel nor blocks the game loop.
+
+__metaclass__ = type
+
+# sound name: (file, channel category)
+SOUNDS = {
+    'player-eat-mouse': ('assets/player-eat-mouse.wav', 'player'),
+    'player-eat-cheese': ('assets/player-eat-cheese.wav', 'player'),
+    'mouse-eat-cheese': ('assets/mouse-eat.wav', 'mouse'),
+    'teleport': ('assets/teleportation.wav', 'teleport'),
+    'wolf': ('assets/wolf.wav', 'game'),
+    'game-over': ('assets/game-over.wav', 'game'),
+}
+
+CATEGORIES = ('player', 'mouse', 'teleport', 'game')
+
+class SoundBank:
+    """The decoded sounds and the mixer channel reserved to each category."""
+
+    def __init__(self):
+        self.sounds = {}
+        self.channels = {}
+        self.dropped = 0 # sounds not played at all
+        self.overlapped = 0 # sounds which cut the previous one of their channel
+        if not pygame.mixer.get_init():
+            # no audio device: every sound is dropped
+            return
+        if pygame.mixer.get_num_channels() < len(CATEGORIES):
+            pygame.mixer.set_num_channels(len(CATEGORIES))
+        pygame.mixer.set_reserved(len(CATEGORIES))
+        for i, category in enumerate(CATEGORIES):
+            self.channels[category] = pygame.mixer.Channel(i)
+        for name, (file, category) in SOUNDS.items():
+            self.sounds[name] = pygame.mixer.Sound(file)
+
+    def play(self, name, queue=False):
+        """Start the sound and return at once.
+
+        With queue, the sound waits for the end of the one playing on its
+        channel instead of cutting it.
+
+        """
+        if name not in self.sounds:
+            self.dropped += 1
+            return
+        channel = self.channels[SOUNDS[name][1]]
+        if channel.get_busy():
+            if queue:
+                # only one sound can wait on a channel
+                if channel.get_queue() is not None:
+                    self.dropped += 1
+                channel.queue(self.sounds[name])
+                return
+            self.overlapped += 1
+        channel.play(self.sounds[name])
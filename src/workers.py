@@ -0,0 +1,100 @@
+import threading
+try:
+    import queue
+except ImportError: # Python 2.x
+    import Queue as queue
+from gconstants import *
+
+# Worker threads running the long jobs out of the main loop.
+#
+# The jobs wait in a bounded queue and run in submission order. Each future
+# is tagged with the generation of the pool when submitted: reset() starts a
+# new generation on a level change, and the jobs left from the previous
+# levels are dropped without running. A job must only read data the main
+# loop does not change any more, and return a new object.
+
+__metaclass__ = type
+
+class Future:
+    """Result of a job, tagged with the pool generation it belongs to."""
+
+    def __init__(self, generation, function, args):
+        self.generation = generation
+        self.function, self.args = function, args
+        self.value = None
+        self.error = None
+        self.cancelled = False
+        self.finished = threading.Event()
+
+    def done(self):
+        return self.finished.is_set()
+
+    def cancel(self):
+        """Drop the job if it did not start yet."""
+        self.cancelled = True
+
+    def run(self):
+        if not self.cancelled:
+            try:
+                self.value = self.function(*self.args)
+            except Exception as error:
+                self.error = error
+        self.finished.set()
+
+    def result(self):
+        """Wait for the job and return its value, None once cancelled."""
+        self.finished.wait()
+        if self.error:
+            raise self.error
+        return self.value
+
+class WorkerPool:
+    """Bounded pool of worker threads.
+
+    Without worker, each job runs at once in submit: the futures behave the
+    same, only sooner.
+
+    """
+
+    def __init__(self, workers=WORKERS, size=WORKER_QUEUE):
+        self.generation = 0
+        self.jobs = queue.Queue(size)
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self.work)
+            thread.daemon = True # never delay the exit of the game
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, function, *args):
+        """Queue function(*args) and return its future. Wait for a free place
+        when the queue is full."""
+        future = Future(self.generation, function, args)
+        if self.threads:
+            self.jobs.put(future)
+        else:
+            future.run()
+        return future
+
+    def reset(self):
+        """Start a new generation: the jobs queued so far are dropped."""
+        self.generation += 1
+
+    def stale(self, future):
+        return future.generation != self.generation
+
+    def work(self):
+        while True:
+            future = self.jobs.get()
+            if future is None:
+                return
+            if self.stale(future):
+                future.cancel()
+            future.run()
+
+    def close(self):
+        for thread in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
@@ -0,0 +1,54 @@
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('TRAP_PROFILE', 'gcw0')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pygame
+import gconstants
+import main
+
+FRAMES = 40 # the first level of 16 x 12 cells is carved in fewer frames
+
+def states(monkeypatch, animation, hidden):
+    """Run main() for FRAMES frames and return the state of each frame."""
+    monkeypatch.setattr(main, 'MAZE_ANIMATION', animation)
+    monkeypatch.setattr(gconstants, 'HIDDEN', hidden)
+    # nothing resumed, saved nor recorded
+    monkeypatch.setattr(main, 'SAVE_FILE', None)
+    monkeypatch.setattr(main, 'RECORD_DIR', None)
+    monkeypatch.setattr(main, 'PROFILE_CSV', None)
+    seen = []
+
+    class Recorder(main.Profiler):
+        def frame(self, state):
+            super(Recorder, self).frame(state)
+            seen.append(state)
+            if len(seen) == FRAMES:
+                pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_ESCAPE))
+
+    monkeypatch.setattr(main, 'Profiler', Recorder)
+    try:
+        main.main()
+    finally:
+        pygame.quit()
+    return seen
+
+def building(seen):
+    """Frames spent in the GENERATING state before the game starts."""
+    return seen.index(main.PLAYING)
+
+def test_first_level_animates(monkeypatch):
+    seen = states(monkeypatch, True, False)
+    assert building(seen) > 1
+    assert seen[:building(seen)] == [main.GENERATING] * building(seen)
+
+def test_hidden_maze_not_animated(monkeypatch):
+    seen = states(monkeypatch, True, True)
+    assert building(seen) == 0
+
+def test_no_animation(monkeypatch):
+    seen = states(monkeypatch, False, False)
+    assert building(seen) == 0